@@ -1,10 +1,12 @@
 import logging
-from flask import Blueprint, jsonify, request, g
+from config import SERVER_TIMING_ENABLED
+from flask import Blueprint, Response, jsonify, request, g, stream_with_context
 from models.request.chat_request import ChatRequest, GetChatHistoryRequest, CreateSessionRequest, PublicChatRequest
 from models.response.response_wrapper import ErrorResponse
 from pydantic import ValidationError
 from services.facade_impl.chat_service_impl import ChatServiceImpl
 from utils.auth import require_auth
+from utils.streaming import format_sse_event
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +16,43 @@ logging.basicConfig(
 
 chat_api = Blueprint("chat_api", __name__)
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop reverse proxies from buffering the stream
+}
+
+
+def _add_server_timing(response, chat_service: ChatServiceImpl):
+    """Expose the chat pipeline stage timings in a Server-Timing header, if enabled"""
+    if SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = chat_service.stage_timer.server_timing_header()
+    return response
+
+
+def _resolve_public_chat(chat_service: ChatServiceImpl, data: PublicChatRequest):
+    """
+    Find the owner of a public chatbot, whether it uses the answer cache and the session to chat in.
+    Returns None if the chatbot does not exist.
+    """
+    # Query user_id of the chatbot owner
+    chatbot_result = chat_service.supabase.table('chatbots').select('user_id, answer_cache_enabled').eq('id', data.chatbot_id).maybe_single().execute()
+    if not chatbot_result or not chatbot_result.data:
+        return None
+
+    owner_user_id = chatbot_result.data['user_id']
+    use_answer_cache = bool(chatbot_result.data.get('answer_cache_enabled'))
+    session_id = data.session_id
+
+    # Auto create session if not provided
+    if not session_id:
+        create_data = CreateSessionRequest(chatbot_id=data.chatbot_id)
+        create_response, status_code = chat_service.create_session(create_data)
+        if status_code != 200:
+            raise Exception(create_response["message"])
+        session_id = create_response["data"]["session_id"]
+
+    return owner_user_id, use_answer_cache, session_id
+
 @chat_api.route("/create-session", methods=["POST"])
 @require_auth
 def create_session():
@@ -82,7 +121,31 @@ def chat():
         data = ChatRequest(**request.json)
         chat_service = ChatServiceImpl(user_token)
         response, status_code = chat_service.chat(user_id, user_token, data)
-        return jsonify(response), status_code
+        return _add_server_timing(jsonify(response), chat_service), status_code
+    except ValidationError as e: # this is for the request body validation
+        error_response = ErrorResponse(
+            success=False,
+            message="Validation failed",
+            data=e.errors()
+        )
+        return jsonify(error_response.model_dump()), 422
+    except Exception as e:
+        error_response = ErrorResponse(
+            success=False,
+            message=str(e)
+        )
+        return jsonify(error_response.model_dump()), 500
+
+@chat_api.route("/stream", methods=["POST"])
+@require_auth
+def chat_stream():
+    try:
+        user_id = g.user_id
+        user_token = g.user_token
+        data = ChatRequest(**request.json)
+        chat_service = ChatServiceImpl(user_token)
+        events = chat_service.chat_stream(user_id, user_token, data)
+        return Response(stream_with_context(events), mimetype="text/event-stream", headers=SSE_HEADERS)
     except ValidationError as e: # this is for the request body validation
         error_response = ErrorResponse(
             success=False,
@@ -120,35 +183,26 @@ def public_chat():
         data = PublicChatRequest(**request.json)  # Validate request
         
         chatbot_id = data.chatbot_id
-        session_id = data.session_id
         query = data.query
 
-        logging.error(f"[PUBLIC CHAT] chatbot_id={chatbot_id}, session_id={session_id}, query={query}")
+        logging.error(f"[PUBLIC CHAT] chatbot_id={chatbot_id}, session_id={data.session_id}, query={query}")
 
         # Init chat service without user token
         chat_service = ChatServiceImpl()
-        
-        # Query user_id of the chatbot owner
-        chatbot_result = chat_service.supabase.table('chatbots').select('user_id').eq('id', chatbot_id).maybe_single().execute()
-        if not chatbot_result.data:
-            return jsonify(ErrorResponse(message="Invalid chatbot_id").model_dump()), 404
-
-        owner_user_id = chatbot_result.data['user_id']
 
-        # Auto create session if not provided
-        if not session_id:
-            create_data = CreateSessionRequest(chatbot_id=chatbot_id)
-            create_response, _ = chat_service.create_session(create_data)
-            session_id = create_response["session_id"]
+        resolved = _resolve_public_chat(chat_service, data)
+        if not resolved:
+            return jsonify(ErrorResponse(message="Invalid chatbot_id").model_dump()), 404
+        owner_user_id, use_answer_cache, session_id = resolved
 
         # Perform chat
         response, status_code = chat_service.chat(owner_user_id, None, ChatRequest(
             chatbot_id=chatbot_id,
             session_id=session_id,
             query=query
-        ))
+        ), use_answer_cache=use_answer_cache)
 
-        return jsonify(response), status_code
+        return _add_server_timing(jsonify(response), chat_service), status_code
 
     except ValidationError as e:
         error_response = ErrorResponse(
@@ -165,6 +219,47 @@ def public_chat():
         )
         return jsonify(error_response.model_dump()), 500
     
+@chat_api.route("/public-chat/stream", methods=["POST"])
+def public_chat_stream():
+    try:
+        data = PublicChatRequest(**request.json)  # Validate request
+
+        logging.info(f"[PUBLIC CHAT STREAM] chatbot_id={data.chatbot_id}, session_id={data.session_id}")
+
+        # Init chat service without user token
+        chat_service = ChatServiceImpl()
+
+        resolved = _resolve_public_chat(chat_service, data)
+        if not resolved:
+            return jsonify(ErrorResponse(message="Invalid chatbot_id").model_dump()), 404
+        owner_user_id, use_answer_cache, session_id = resolved
+
+        def events():
+            # Tell the client which session it is in, it may have been created just now
+            yield format_sse_event("session", {"session_id": session_id})
+            yield from chat_service.chat_stream(owner_user_id, None, ChatRequest(
+                chatbot_id=data.chatbot_id,
+                session_id=session_id,
+                query=data.query
+            ), use_answer_cache=use_answer_cache)
+
+        return Response(stream_with_context(events()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+    except ValidationError as e:
+        error_response = ErrorResponse(
+            success=False,
+            message="Validation failed",
+            data=e.errors()
+        )
+        return jsonify(error_response.model_dump()), 422
+    except Exception as e:
+        logging.error(f"[PUBLIC CHAT STREAM ERROR] {str(e)}")
+        error_response = ErrorResponse(
+            success=False,
+            message=str(e)
+        )
+        return jsonify(error_response.model_dump()), 500
+
 @chat_api.route("/public-create-session", methods=["POST"])
 def public_create_session():
     try:
@@ -1,12 +1,31 @@
+import logging
+from exceptions.queue_full_exception import QueueFullException
 from flask import Blueprint, g, jsonify, request
 from services.facade_impl.chatbot_service_impl import ChatbotServiceImpl
-from utils.auth import require_auth
+from utils.auth import create_user_token, require_auth
+from utils.job_queue import JobQueue
 from models.request.chatbot_request import UploadDocumentRequest, DeleteDocumentRequest, CreateChatbotRequest
 from models.response.response_wrapper import ErrorResponse
 
 chatbot_api = Blueprint("chatbot_api", __name__)
 
 
+UPDATE_INDEX_AFTER_DELETE_JOB = "update_index_after_delete"
+
+
+def update_index_after_delete_task(payload: dict) -> dict:
+    """Background job removing a deleted document from its chatbot's vector store"""
+    user_token = create_user_token(payload['user_id'])
+    chatbot_service = ChatbotServiceImpl(user_token)
+    response, status_code = chatbot_service.update_index_after_delete(
+        payload['user_id'], user_token, payload['chatbot_id'], payload['document_id'], payload['file_name']
+    )
+    return {'response': response, 'status_code': status_code}
+
+
+JobQueue().register(UPDATE_INDEX_AFTER_DELETE_JOB, update_index_after_delete_task)
+
+
 @chatbot_api.route("", methods=["GET"])
 @require_auth  # Require user to be authenticated
 def get_user_chatbots():
@@ -105,12 +124,29 @@ def delete_document():
         data = DeleteDocumentRequest(**request.json)
         chatbot_service = ChatbotServiceImpl(user_token)
         response, status_code = chatbot_service.delete_document(user_id, data)
-        if status_code == 200:
-            # Rebuild the vector store
-            _, status_code = chatbot_service.rebuild_vector_store(user_id, user_token, data.chatbot_id)
+        if status_code != 200:
             return jsonify(response), status_code
-        else:
+
+        # Update the vector store in a queued job. It shares the chatbot's concurrency key with ingestions,
+        # so neither publishes an index built from a version the other has already replaced
+        try:
+            task_id = JobQueue().submit(
+                UPDATE_INDEX_AFTER_DELETE_JOB,
+                tenant_id=user_id,
+                payload={
+                    'user_id': user_id,
+                    'chatbot_id': data.chatbot_id,
+                    'document_id': data.document_id,
+                    'file_name': response['data']['file_name']
+                },
+                concurrency_key=data.chatbot_id
+            )
+        except QueueFullException as e:
+            # The document is gone, the next ingestion of the chatbot drops its chunks from the index
+            logging.warning(f"Vector store update after deleting document {data.document_id} not queued: {e.message}")
             return jsonify(response), status_code
+        response['data']['task_id'] = task_id
+        return jsonify(response), 202  # 202 Accepted
     except Exception as e:
         return jsonify(ErrorResponse(
             message=str(e)
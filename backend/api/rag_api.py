@@ -1,12 +1,12 @@
 import logging
-import uuid
+from exceptions.queue_full_exception import QueueFullException
 from flask import Blueprint, jsonify, request, g
 from models.request.rag_request import ProcessDocumentsRequest
 from models.response.response_wrapper import ErrorResponse, SuccessResponse
 from pydantic import ValidationError
 from services.facade_impl.rag_service_impl import RAGServiceImpl
-from utils.auth import require_auth
-from utils.background_task_manager import BackgroundTaskManager
+from utils.auth import create_user_token, require_auth
+from utils.job_queue import JobQueue
 
 # Configure logging
 logging.basicConfig(
@@ -17,16 +17,23 @@ logging.basicConfig(
 rag_api = Blueprint("rag_api", __name__)
 
 
-def process_documents_task(user_id: str, user_token: str, data: ProcessDocumentsRequest) -> dict:
-    """Background task for processing documents"""
+PROCESS_DOCUMENTS_JOB = "process_documents"
+
+
+def process_documents_task(payload: dict) -> dict:
+    """Background job for processing documents"""
     rag_service = RAGServiceImpl()
-    response, status_code = rag_service.process_documents_from_urls(user_id, user_token, data)
+    data = ProcessDocumentsRequest(**payload['data'])
+    # Act for the job's user with a fresh token, user tokens are never stored with the job
+    user_token = create_user_token(payload['user_id'])
+    response, status_code = rag_service.process_documents_from_urls(payload['user_id'], user_token, data)
+    # notification logic ...  send a WebSocket message
+    logging.info(f"~~~~~~~~~ Processing chatbot {data.chatbot_id} completed with status {status_code} ~~~~~~~~~")
     return {'response': response, 'status_code': status_code}
 
-def process_complete_callback(task_id: str, result: dict):
-    """Callback function when processing is complete"""
-    # notification logic ...  send a WebSocket message
-    logging.info(f"~~~~~~~~~ Task {task_id} completed with result: {result} ~~~~~~~~~")
+
+# Every process serving the API also runs a fixed pool of workers for the queued jobs
+JobQueue().register(PROCESS_DOCUMENTS_JOB, process_documents_task)
 
 
 @rag_api.route("/process", methods=["POST"])
@@ -34,25 +41,20 @@ def process_complete_callback(task_id: str, result: dict):
 def process_documents():
     try:
         user_id = g.user_id
-        user_token = g.user_token
         data = ProcessDocumentsRequest(**request.json)
         
-        task_manager = BackgroundTaskManager()
-        
-        # Generate a unique task ID
-        task_id = str(uuid.uuid4())
-        
-        # Start background processing
-        task_manager.run_task(
-            task_id=task_id,
-            target=process_documents_task,
-            args=(user_id, user_token, data),
-            callback=process_complete_callback
+        # Queue the processing, a worker of any API process picks it up.
+        # Ingestions of one chatbot run one at a time, so each builds on the index the previous one published
+        task_id = JobQueue().submit(
+            PROCESS_DOCUMENTS_JOB,
+            tenant_id=user_id,
+            payload={'user_id': user_id, 'data': data.model_dump()},
+            concurrency_key=data.chatbot_id
         )
         
         # Return immediate response
         return jsonify(SuccessResponse(
-            message="Document processing started",
+            message="Document processing queued",
             data={"task_id": task_id}
         ).model_dump()), 202  # 202 Accepted
 
@@ -62,6 +64,12 @@ def process_documents():
             data=e.errors()
         )
         return jsonify(error_response.model_dump()), 422
+    except QueueFullException as e:
+        error_response = ErrorResponse(
+            message=e.message,
+            data=e.data
+        )
+        return jsonify(error_response.model_dump()), e.status_code
     except Exception as e:
         error_response = ErrorResponse(
             message=str(e)
@@ -73,8 +81,8 @@ def process_documents():
 def get_task_status(task_id: str):
     """Get the status of a document processing task"""
     try:
-        task_manager = BackgroundTaskManager()
-        status = task_manager.get_task_status(task_id)
+        # Jobs live in the shared job store, so any process can answer
+        status = JobQueue().get_status(task_id, g.user_id)
         return jsonify(SuccessResponse(
             message="Task status retrieved",
             data=status
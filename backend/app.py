@@ -5,9 +5,10 @@ from api.rag_api import rag_api
 from exceptions.database_exception import DatabaseException
 from exceptions.base_api_exception import BaseAPIException
 from exceptions.unauthorized_exception import UnauthorizedException
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from models.response.response_wrapper import ErrorResponse
+from utils.stage_timer import LatencyHistogram
 import logging
 import os
 import sys
@@ -38,6 +39,11 @@ def create_app():
     def home():
         return jsonify({"message": "Backend is running!"})
 
+    @app.route("/metrics")
+    def metrics():
+        # Chat pipeline stage latencies of this process, in the Prometheus text format
+        return Response(LatencyHistogram().render(), mimetype="text/plain; version=0.0.4")
+
     @app.errorhandler(BaseAPIException)
     def handle_custom_error(error: BaseAPIException) -> jsonify:
         error_response = ErrorResponse[dict](
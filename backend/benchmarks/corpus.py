@@ -0,0 +1,140 @@
+import csv
+import io
+import random
+from typing import List, Tuple
+
+# Small fixed vocabulary, so generated documents and questions share words and retrieval has something to find
+VOCABULARY = (
+    "account address battery billing cable camera charger contract delivery device discount display "
+    "engine error firmware guarantee installation invoice keyboard laptop license memory modem monitor "
+    "network order package password payment phone plan price printer processor refund repair return "
+    "router screen server service shipping software speaker storage subscription support tablet "
+    "voucher warranty wireless"
+).split()
+FILLER = "the a of to and for with on in is are can will be your our this that when after before".split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(VOCABULARY if rng.random() < 0.4 else FILLER) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def text_document(rng: random.Random, paragraphs: int) -> bytes:
+    """Plain text document, paragraphs separated by blank lines like the splitter expects"""
+    return "\n\n".join(
+        " ".join(_sentence(rng) for _ in range(rng.randint(3, 8))) for _ in range(paragraphs)
+    ).encode("utf-8")
+
+
+def csv_document(rng: random.Random, rows: int) -> bytes:
+    """Product table with a header row"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["sku", "product", "category", "price", "description"])
+    for i in range(rows):
+        writer.writerow([
+            f"SKU-{i:05d}",
+            f"{rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}",
+            rng.choice(VOCABULARY),
+            f"{rng.uniform(5, 500):.2f}",
+            _sentence(rng),
+        ])
+    return output.getvalue().encode("utf-8")
+
+
+def generate_corpus(seed: int, documents: int, paragraphs: int) -> List[Tuple[str, bytes]]:
+    """(file name, content) pairs, every fourth document is a CSV table"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(documents):
+        if i % 4 == 3:
+            corpus.append((f"table_{i:03d}.csv", csv_document(rng, paragraphs * 5)))
+        else:
+            corpus.append((f"document_{i:03d}.txt", text_document(rng, paragraphs)))
+    return corpus
+
+
+def generate_questions(seed: int, count: int) -> List[str]:
+    rng = random.Random(seed + 1)
+    return [
+        f"What does the documentation say about the {rng.choice(VOCABULARY)} and {rng.choice(VOCABULARY)}?"
+        for _ in range(count)
+    ]
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_document(rng: random.Random, pages: int, table_ratio: float) -> bytes:
+    """
+    PDF of prose pages and pages with a ruled price table, table_ratio of the pages have one.
+    Written directly, with the standard Helvetica font, so no PDF library is needed.
+    """
+    width, height = 612, 792
+    streams = []
+    sku = 0
+    for page_num in range(pages):
+        ops = []
+
+        def text(x: float, y: float, value: str, size: int = 10) -> None:
+            ops.append(f"BT /F1 {size} Tf {x} {y} Td ({_pdf_string(value)}) Tj ET")
+
+        y = height - 60
+        text(50, y, f"Section {page_num + 1}", 14)
+        y -= 24
+        if rng.random() < table_ratio:
+            for _ in range(3):
+                text(50, y, _sentence(rng)[:90])
+                y -= 14
+            columns = [50, 150, 420, 540]
+            rows = [["SKU", "Description", "Price"]] + [
+                [f"SKU-{sku + i:05d}", f"{rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}", f"{rng.uniform(5, 500):.2f}"]
+                for i in range(rng.randint(10, 30))
+            ]
+            sku += len(rows)
+            top, row_height = y - 10, 16
+            for r, row in enumerate(rows):
+                for c, value in enumerate(row):
+                    text(columns[c] + 3, top - r * row_height - 12, value, 9)
+            bottom = top - len(rows) * row_height
+            for r in range(len(rows) + 1):
+                ops.append(f"{columns[0]} {top - r * row_height} m {columns[-1]} {top - r * row_height} l S")
+            for x in columns:
+                ops.append(f"{x} {top} m {x} {bottom} l S")
+        else:
+            # Paragraphs wrapped at about 90 characters a line
+            while y > 80:
+                line = ""
+                for word in " ".join(_sentence(rng) for _ in range(rng.randint(3, 6))).split():
+                    if len(line) + len(word) > 90:
+                        text(50, y, line)
+                        y -= 14
+                        line = ""
+                    line += word + " "
+                text(50, y, line)
+                y -= 24
+        streams.append("\n".join(ops).encode("latin-1"))
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(pages))}] /Count {pages} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, stream in enumerate(streams):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(output))
+        output += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(output)
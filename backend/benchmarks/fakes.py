@@ -0,0 +1,327 @@
+import copy
+import hashlib
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, unquote, urlparse
+
+import numpy as np
+from langchain.callbacks.manager import CallbackManagerForLLMRun
+from langchain.chat_models.base import BaseChatModel
+from langchain.embeddings.base import Embeddings
+from langchain.schema.messages import AIMessage, BaseMessage
+from langchain.schema.output import ChatGeneration, ChatResult
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embedding model, each word is hashed into one of `dimensions` buckets.
+    Texts sharing words get similar vectors, so retrieval still returns sensible chunks.
+    """
+
+    def __init__(self, dimensions: int = 256, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency  # seconds per request, like one round trip to the embeddings API
+        self.model = "fake-embeddings"
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that waits `latency` seconds and answers with `answer_tokens` words, streamed token by token"""
+    latency: float = 0.0
+    answer_tokens: int = 40
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Answer with words of the prompt so answers differ between questions like real ones do
+        words = re.findall(r"\w+", messages[-1].content) or ["answer"]
+        tokens = [f"{words[i % len(words)]} " for i in range(self.answer_tokens)]
+        # The first token arrives after half the latency, the rest is spread over the other half
+        time.sleep(self.latency / 2)
+        for token in tokens:
+            time.sleep(self.latency / 2 / len(tokens))
+            if self.streaming and run_manager:
+                run_manager.on_llm_new_token(token)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens).strip()))])
+
+
+class FakeResponse:
+    """Result of FakeQuery.execute, mirrors the `data` and `count` attributes of postgrest responses"""
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """Subset of the postgrest query builder used by the services"""
+
+    def __init__(self, supabase: "FakeSupabase", table: str):
+        self.supabase = supabase
+        self.table = table
+        self.action = "select"
+        self.payload: Any = None
+        self.filters: List[Any] = []
+        self.order_by: Optional[tuple] = None
+        self.row_limit: Optional[int] = None
+        self.columns = "*"
+        self.count: Optional[str] = None
+        self.single_row = False
+        self.maybe_single_row = False
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "FakeQuery":
+        self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, rows: Any) -> "FakeQuery":
+        self.action = "insert"
+        self.payload = rows
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "FakeQuery":
+        self.action = "update"
+        self.payload = values
+        return self
+
+    def delete(self) -> "FakeQuery":
+        self.action = "delete"
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column: str, values: List[Any]) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, size: int) -> "FakeQuery":
+        self.row_limit = size
+        return self
+
+    def single(self) -> "FakeQuery":
+        self.single_row = True
+        return self
+
+    def maybe_single(self) -> "FakeQuery":
+        self.maybe_single_row = True
+        return self
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        return all(matches(row) for matches in self.filters)
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if self.columns.strip() == "*":
+            return copy.deepcopy(row)
+        return {column.strip(): copy.deepcopy(row.get(column.strip())) for column in self.columns.split(",")}
+
+    def execute(self) -> Optional[FakeResponse]:
+        self.supabase.round_trip()
+        with self.supabase.lock:
+            rows = self.supabase.tables.setdefault(self.table, [])
+            if self.action == "insert":
+                new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                new_rows = [self.supabase.with_defaults(row) for row in new_rows]
+                rows.extend(new_rows)
+                return FakeResponse(copy.deepcopy(new_rows))
+            if self.action == "update":
+                updated = [row for row in rows if self._matches(row)]
+                for row in updated:
+                    row.update(self.payload)
+                    row["updated_at"] = self.supabase.now()
+                return FakeResponse(copy.deepcopy(updated))
+            if self.action == "delete":
+                deleted = [row for row in rows if self._matches(row)]
+                self.supabase.tables[self.table] = [row for row in rows if not self._matches(row)]
+                return FakeResponse(copy.deepcopy(deleted))
+
+            selected = [row for row in rows if self._matches(row)]
+            if self.order_by:
+                column, desc = self.order_by
+                selected.sort(key=lambda row: row.get(column) or "", reverse=desc)
+            if self.row_limit is not None:
+                selected = selected[:self.row_limit]
+            data = [self._project(row) for row in selected]
+            count = len(data) if self.count else None
+        if self.single_row:
+            if len(data) != 1:
+                raise Exception(f"Expected a single row from {self.table}, got {len(data)}")
+            return FakeResponse(data[0], count)
+        if self.maybe_single_row:
+            # like postgrest-py, no row at all gives no response
+            return FakeResponse(data[0], count) if data else None
+        return FakeResponse(data, count)
+
+
+class FakeBucket:
+    """Subset of the storage bucket API used by the services"""
+
+    def __init__(self, storage: "FakeStorage", bucket: str):
+        self.storage = storage
+        self.bucket = bucket
+
+    def upload(self, path: str, file: Any) -> Dict[str, str]:
+        content = file.read() if hasattr(file, "read") else file
+        self.storage.supabase.round_trip()
+        with self.storage.lock:
+            self.storage.objects[(self.bucket, path)] = bytes(content)
+        return {"Key": f"{self.bucket}/{path}"}
+
+    def download(self, path: str) -> bytes:
+        self.storage.supabase.round_trip()
+        with self.storage.lock:
+            if (self.bucket, path) not in self.storage.objects:
+                raise Exception(f"Object not found: {self.bucket}/{path}")
+            return self.storage.objects[(self.bucket, path)]
+
+    def remove(self, paths: List[str]) -> List[Dict[str, str]]:
+        self.storage.supabase.round_trip()
+        with self.storage.lock:
+            for path in paths:
+                self.storage.objects.pop((self.bucket, path), None)
+        return [{"name": path} for path in paths]
+
+    def list(self, folder: str = "", options: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+        self.storage.supabase.round_trip()
+        prefix = folder.rstrip("/") + "/" if folder else ""
+        entries: Dict[str, Dict[str, Any]] = {}
+        with self.storage.lock:
+            for bucket, path in self.storage.objects:
+                if bucket != self.bucket or not path.startswith(prefix):
+                    continue
+                name, _, rest = path[len(prefix):].partition("/")
+                # like Supabase, sub folders are listed once and without an id
+                entries[name] = {"name": name, "id": None} if rest else {"name": name, "id": path}
+        # like Supabase, one page of at most limit entries, 100 by default
+        options = options or {}
+        offset = options.get("offset", 0)
+        return sorted(entries.values(), key=lambda entry: entry["name"])[offset:offset + options.get("limit", 100)]
+
+    def create_signed_url(self, path: str, expires_in: int) -> Dict[str, str]:
+        self.storage.supabase.round_trip()
+        url = f"{self.storage.base_url}/{quote(self.bucket)}/{quote(path)}?token=benchmark"
+        return {"signedURL": url, "signedUrl": url}
+
+
+class FakeStorage:
+    """
+    In-memory object storage.
+    Signed URLs point to a local HTTP server, so documents are downloaded with requests like in production.
+    """
+
+    def __init__(self, supabase: "FakeSupabase"):
+        self.supabase = supabase
+        self.objects: Dict[tuple, bytes] = {}
+        self.lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.base_url = ""
+
+    def from_(self, bucket: str) -> FakeBucket:
+        return FakeBucket(self, bucket)
+
+    def start_server(self) -> None:
+        """Serve the stored objects on a free localhost port"""
+        storage = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                bucket, _, path = unquote(urlparse(self.path).path).lstrip("/").partition("/")
+                with storage.lock:
+                    content = storage.objects.get((bucket, path))
+                if content is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        thread = threading.Thread(target=self.server.serve_forever, name="fake-storage")
+        thread.daemon = True # Thread will be terminated when the main thread terminates
+        thread.start()
+
+    def stop_server(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class FakeSupabase:
+    """
+    In-memory stand-in for the supabase Client, covering the table and storage calls the services make.
+    Every request sleeps `latency` seconds to model the network round trip to Supabase.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+        self.storage = FakeStorage(self)
+        self.round_trips = 0
+        self.clock = datetime.utcnow()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def round_trip(self) -> None:
+        with self.lock:
+            self.round_trips += 1
+        time.sleep(self.latency)
+
+    def now(self) -> str:
+        """Strictly increasing timestamps, so ordering by created_at is stable, caller must hold lock"""
+        self.clock += timedelta(microseconds=1)
+        return self.clock.isoformat()
+
+    def with_defaults(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill the columns the database would default, caller must hold lock"""
+        now = self.now()
+        return {'id': str(uuid.uuid4()), 'created_at': now, 'updated_at': now, **copy.deepcopy(row)}
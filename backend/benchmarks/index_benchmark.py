@@ -0,0 +1,113 @@
+"""
+Recall versus latency of the index structures RAGServiceImpl can publish, measured against exact flat search.
+
+Vectors are synthetic, unit length and clustered like text embeddings. Queries are searched one at a time,
+as a chat turn does. Parameters come from utils.index_builder.choose_index_params.
+
+Usage (from the backend directory):
+    python -m benchmarks.index_benchmark --vectors 200000 --dimension 1536 --nprobe 8,16,32
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import faiss
+import numpy as np
+from benchmarks.run_benchmarks import percentile
+from utils.index_builder import INDEX_TYPES, apply_search_params, build_search_index, choose_index_params
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recall versus latency of the vector index types")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10, help="neighbours per query, recall is measured at k")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES), help="comma separated index types")
+    parser.add_argument("--nprobe", default="", help="comma separated nprobe values to sweep for IVF types")
+    parser.add_argument("--ef-search", default="", help="comma separated efSearch values to sweep for HNSW")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args()
+
+
+def clustered_vectors(rng: np.random.Generator, count: int, centers: np.ndarray) -> np.ndarray:
+    vectors = centers[rng.integers(len(centers), size=count)]
+    vectors = vectors + rng.normal(scale=0.5, size=vectors.shape)
+    vectors = vectors.astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def measure(index: Any, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, found = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found[0]) & set(expected))
+    return {
+        "recall": hits / (len(queries) * k),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(max(8, args.vectors // 500), args.dimension))
+    vectors = clustered_vectors(rng, args.vectors, centers)
+    queries = clustered_vectors(rng, args.queries, centers)
+
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    results = []
+    for index_type in args.types.split(","):
+        params = choose_index_params(args.vectors, args.dimension, index_type)
+        if params["type"] != index_type:
+            print(f"{index_type:<9} skipped, {args.vectors} vectors are too few to train it")
+            continue
+        start = time.perf_counter()
+        index = build_search_index(vectors, params)
+        build_seconds = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 1024 / 1024
+
+        # The recorded parameters first, then any requested sweep values
+        settings = [dict(params)]
+        if "nprobe" in params and args.nprobe:
+            settings += [{**params, "nprobe": int(value)} for value in args.nprobe.split(",")]
+        if "ef_search" in params and args.ef_search:
+            settings += [{**params, "ef_search": int(value)} for value in args.ef_search.split(",")]
+
+        for setting in settings:
+            apply_search_params(index, setting)
+            result = {
+                "type": index_type,
+                "factory": setting["factory"],
+                "nprobe": setting.get("nprobe"),
+                "ef_search": setting.get("ef_search"),
+                "build_s": build_seconds,
+                "size_mb": size_mb,
+                **measure(index, queries, truth, args.k),
+            }
+            results.append(result)
+            knob = f"nprobe={result['nprobe']}" if result["nprobe"] else \
+                f"efSearch={result['ef_search']}" if result["ef_search"] else "exact"
+            print(
+                f"{index_type:<9} {setting['factory']:<16} {knob:<14} recall@{args.k}={result['recall']:.3f} "
+                f"p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms "
+                f"size={size_mb:.1f}MB build={build_seconds:.1f}s"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
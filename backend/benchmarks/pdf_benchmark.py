@@ -0,0 +1,81 @@
+"""
+PDF extraction throughput in pages per second, with and without the pdfium route for pages without lines or curves.
+
+The PDF is synthetic: prose pages and pages with a ruled price table, see benchmarks.corpus.pdf_document.
+With --processes the pages are also extracted in parallel, in ranges, like ingestion does with INGEST_PARALLEL.
+
+Usage (from the backend directory):
+    python -m benchmarks.pdf_benchmark --pages 200 --table-ratio 0.2 --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from benchmarks.corpus import pdf_document
+from services.facade_impl.pdf_processor import PDFProcessor
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="PDF extraction throughput in pages per second")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--table-ratio", type=float, default=0.2, help="share of pages with a table")
+    parser.add_argument("--processes", type=int, default=0, help="also extract in parallel with this many processes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode, the fastest counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args()
+
+
+def measure(path: str, pages: int, repeat: int, fast_text_pages: bool,
+            executor: Optional[ProcessPoolExecutor] = None) -> Dict[str, Any]:
+    best = float("inf")
+    text = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = PDFProcessor(path, fast_text_pages).process_file(executor)
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": best, "pages_per_second": pages / best, "characters": len(text)}
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "benchmark.pdf")
+        with open(path, "wb") as f:
+            f.write(pdf_document(random.Random(args.seed), args.pages, args.table_ratio))
+
+        modes = [("table pipeline", False, None), ("fast text pages", True, None)]
+        executor = None
+        if args.processes:
+            executor = ProcessPoolExecutor(max_workers=args.processes, mp_context=multiprocessing.get_context("spawn"))
+            # Start the workers before timing
+            list(executor.map(abs, range(args.processes)))
+            modes += [(f"table pipeline x{args.processes}", False, executor),
+                      (f"fast text pages x{args.processes}", True, executor)]
+
+        results = []
+        try:
+            for name, fast_text_pages, mode_executor in modes:
+                result = {"mode": name, **measure(path, args.pages, args.repeat, fast_text_pages, mode_executor)}
+                results.append(result)
+                print(
+                    f"{name:<22} {result['pages_per_second']:8.1f} pages/s "
+                    f"{result['seconds']:.2f}s {result['characters']} characters"
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
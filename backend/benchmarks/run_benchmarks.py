@@ -0,0 +1,259 @@
+"""
+Offline benchmark of document ingestion and chat.
+
+Runs the real RAGServiceImpl.process_documents_from_urls and ChatServiceImpl.chat code paths against
+a fake embedding model, a fake chat model and an in-memory Supabase, no network access or API keys needed.
+
+Usage (from the backend directory):
+    python -m benchmarks.run_benchmarks --documents 40 --chat-turns 200 --concurrency 8 --llm-latency 0.3
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.corpus import generate_corpus, generate_questions
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakeSupabase
+
+BUCKET_NAME = "DOCUMENTS"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline ingestion and chat benchmark")
+    parser.add_argument("--documents", type=int, default=20, help="documents in the synthetic corpus")
+    parser.add_argument("--paragraphs", type=int, default=30, help="paragraphs per text document")
+    parser.add_argument("--ingest-runs", type=int, default=3, help="times the whole corpus is ingested")
+    parser.add_argument("--chat-turns", type=int, default=100, help="chat requests in total")
+    parser.add_argument("--sessions", type=int, default=10, help="chat sessions the turns are spread over")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions chatting at the same time")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="seconds per fake embeddings request")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="seconds per fake Supabase request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure peak Python heap per scenario with tracemalloc (slows the run down)")
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args()
+
+
+def configure_environment(work_dir: str) -> None:
+    """Settings read when config is imported, so this runs before any service module is imported"""
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # only checked for presence, the models are fakes
+    os.environ["INDEX_DISK_CACHE_DIR"] = os.path.join(work_dir, "index-cache")
+    os.environ.pop("EMBEDDING_CACHE_SQLITE_PATH", None)
+
+
+def install_fakes(supabase: FakeSupabase, embeddings: FakeEmbeddings, answer_llm: FakeChatModel,
+                  condense_question_llm: FakeChatModel) -> None:
+    """Point the services at the fakes, production code is left untouched"""
+    import config
+    import services.facade_impl.chat_service_impl as chat_service_impl
+    import services.facade_impl.rag_service_impl as rag_service_impl
+    from utils.conversation_chain_factory import ConversationChainFactory
+
+    for module in (config, chat_service_impl, rag_service_impl):
+        module.get_supabase_client = lambda user_token=None: supabase
+    for module in (chat_service_impl, rag_service_impl):
+        module.OpenAIEmbeddings = lambda **kwargs: embeddings
+
+    factory = ConversationChainFactory()
+    factory.answer_llm = answer_llm
+    factory.condense_question_llm = condense_question_llm
+
+
+def seed_chatbot(supabase: FakeSupabase, user_id: str, chatbot_id: str, corpus: List[tuple]) -> None:
+    """Create the chatbot row and upload the corpus like ChatbotServiceImpl.upload_document does"""
+    supabase.table("chatbots").insert({
+        "id": chatbot_id, "user_id": user_id, "name": "Benchmark", "description": "Synthetic corpus",
+    }).execute()
+    for file_name, content in corpus:
+        bucket_path = f"{user_id}/{chatbot_id}/document/{file_name}"
+        supabase.storage.from_(BUCKET_NAME).upload(bucket_path, content)
+        supabase.table("documents").insert({
+            "chatbot_id": chatbot_id,
+            "file_name": file_name,
+            "file_type": file_name.split(".")[-1],
+            "bucket_path": bucket_path,
+            "is_processed": False,
+        }).execute()
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def summarize(latencies: List[float], elapsed: float, units: int) -> Dict[str, float]:
+    return {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "elapsed_s": elapsed,
+        "throughput_per_s": units / elapsed if elapsed else 0.0,
+    }
+
+
+@contextlib.contextmanager
+def measure_memory(enabled: bool, result: Dict[str, Any]):
+    """Record the peak traced Python heap of the block, and the peak RSS of the process so far"""
+    if enabled:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if enabled:
+            result["peak_heap_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["peak_rss_mb"] = max_rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def run_ingestion(args: argparse.Namespace, supabase: FakeSupabase, embeddings: FakeEmbeddings,
+                  user_id: str, chatbot_id: str) -> Dict[str, Any]:
+    from models.request.rag_request import ProcessDocumentsRequest
+    from services.facade_impl.rag_service_impl import RAGServiceImpl
+
+    latencies = []
+    chunks = 0
+    embedded_before = embeddings.texts_embedded
+    result: Dict[str, Any] = {}
+    start = time.perf_counter()
+    with measure_memory(args.trace_memory, result):
+        for run in range(args.ingest_runs):
+            if run:
+                # Re-ingest the same corpus, like a rebuild after a document was deleted
+                supabase.table("documents").update({"is_processed": False}) \
+                    .eq("chatbot_id", chatbot_id).neq("file_type", "faiss").neq("file_type", "pkl").execute()
+            run_start = time.perf_counter()
+            response, status = RAGServiceImpl().process_documents_from_urls(
+                user_id, None, ProcessDocumentsRequest(chatbot_id=chatbot_id)
+            )
+            latencies.append(time.perf_counter() - run_start)
+            if status != 200:
+                raise RuntimeError(f"Ingestion failed with status {status}: {response}")
+            chunks += response["data"]["processed_count"]
+    elapsed = time.perf_counter() - start
+
+    result.update(summarize(latencies, elapsed, args.documents * args.ingest_runs))
+    result["chunks_per_s"] = chunks / elapsed if elapsed else 0.0
+    result["texts_embedded"] = embeddings.texts_embedded - embedded_before
+    return result
+
+
+def run_chat(args: argparse.Namespace, user_id: str, chatbot_id: str) -> Dict[str, Any]:
+    from models.request.chat_request import ChatRequest, CreateSessionRequest
+    from services.facade_impl.chat_service_impl import ChatServiceImpl
+
+    session_ids = []
+    for _ in range(args.sessions):
+        response, status = ChatServiceImpl().create_session(CreateSessionRequest(chatbot_id=chatbot_id))
+        if status != 200:
+            raise RuntimeError(f"Creating a session failed with status {status}: {response}")
+        session_ids.append(response["data"]["session_id"])
+
+    questions = generate_questions(args.seed, args.chat_turns)
+    # Turns of one session run in order, different sessions run concurrently
+    turns_per_session: Dict[str, List[str]] = {session_id: [] for session_id in session_ids}
+    for i, question in enumerate(questions):
+        turns_per_session[session_ids[i % len(session_ids)]].append(question)
+
+    latencies: List[float] = []
+    errors: List[Any] = []
+    results_lock = threading.Lock()
+
+    def chat_session(session_id: str) -> None:
+        for question in turns_per_session[session_id]:
+            turn_start = time.perf_counter()
+            # A new service per request, like the API routes create
+            response, status = ChatServiceImpl().chat(
+                user_id, None, ChatRequest(chatbot_id=chatbot_id, session_id=session_id, query=question)
+            )
+            with results_lock:
+                latencies.append(time.perf_counter() - turn_start)
+                if status != 200:
+                    errors.append(response)
+
+    result: Dict[str, Any] = {}
+    start = time.perf_counter()
+    with measure_memory(args.trace_memory, result):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(chat_session, session_ids))
+    elapsed = time.perf_counter() - start
+
+    result.update(summarize(latencies, elapsed, len(latencies)))
+    result["errors"] = len(errors)
+    return result
+
+
+def format_report(results: Dict[str, Any]) -> str:
+    lines = [f"Settings: {json.dumps(results['settings'])}"]
+    for scenario in ("ingestion", "chat"):
+        data = results[scenario]
+        unit = "documents/s" if scenario == "ingestion" else "requests/s"
+        lines.append(
+            f"{scenario:<10} n={data['count']:<5} p50={data['p50_ms']:.1f}ms p95={data['p95_ms']:.1f}ms "
+            f"max={data['max_ms']:.1f}ms throughput={data['throughput_per_s']:.2f} {unit} "
+            f"peak_rss={data['peak_rss_mb']:.0f}MB"
+            + (f" peak_heap={data['peak_heap_mb']:.1f}MB" if "peak_heap_mb" in data else "")
+        )
+    lines.append(
+        f"ingestion chunks/s={results['ingestion']['chunks_per_s']:.1f} "
+        f"texts embedded={results['ingestion']['texts_embedded']}, "
+        f"chat errors={results['chat']['errors']}, supabase round trips={results['supabase_round_trips']}"
+    )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    args = parse_args()
+    work_dir = tempfile.mkdtemp(prefix="chatbot-benchmark-")
+    configure_environment(work_dir)
+
+    supabase = FakeSupabase(latency=args.db_latency)
+    supabase.storage.start_server()
+    embeddings = FakeEmbeddings(latency=args.embedding_latency)
+    install_fakes(
+        supabase,
+        embeddings,
+        answer_llm=FakeChatModel(latency=args.llm_latency, streaming=True),
+        condense_question_llm=FakeChatModel(latency=args.llm_latency, answer_tokens=12),
+    )
+    logging.getLogger().setLevel(logging.WARNING)
+
+    user_id, chatbot_id = str(uuid.uuid4()), str(uuid.uuid4())
+    seed_chatbot(supabase, user_id, chatbot_id, generate_corpus(args.seed, args.documents, args.paragraphs))
+
+    # The chains are built with verbose=True, keep their prompt dumps out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingestion = run_ingestion(args, supabase, embeddings, user_id, chatbot_id)
+        chat = run_chat(args, user_id, chatbot_id)
+    supabase.storage.stop_server()
+
+    results = {
+        "settings": {key: value for key, value in vars(args).items() if key != "json"},
+        "ingestion": ingestion,
+        "chat": chat,
+        "supabase_round_trips": supabase.round_trips,
+    }
+    print(format_report(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
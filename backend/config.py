@@ -1,5 +1,9 @@
 import os
 import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
 
 from dotenv import load_dotenv
 from supabase import Client, ClientOptions, create_client
@@ -12,10 +16,89 @@ SUPABASE_SECRET_KEY: str = os.getenv("SUPABASE_SECRET_KEY")
 SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET")
 SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY")
 
+# Maximum number of user-scoped Supabase clients kept alive per process
+SUPABASE_CLIENT_POOL_SIZE: int = int(os.getenv("SUPABASE_CLIENT_POOL_SIZE", 256))
 
-def get_supabase_client(user_token=None) -> Client:
+# Write-behind persistence of chat messages: queue them and flush in batched inserts
+CHAT_WRITE_BEHIND: bool = os.getenv("CHAT_WRITE_BEHIND", "false").lower() == "true"
+CHAT_WRITE_BEHIND_INTERVAL: float = float(os.getenv("CHAT_WRITE_BEHIND_INTERVAL", 0.5))  # seconds
+CHAT_WRITE_BEHIND_BATCH_SIZE: int = int(os.getenv("CHAT_WRITE_BEHIND_BATCH_SIZE", 100))
+CHAT_WRITE_BEHIND_MAX_RETRIES: int = int(os.getenv("CHAT_WRITE_BEHIND_MAX_RETRIES", 3))
+
+# Embedding cache: in-memory LRU size and optional SQLite file for a persistent tier
+EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 50000))
+EMBEDDING_CACHE_SQLITE_PATH: Optional[str] = os.getenv("EMBEDDING_CACHE_SQLITE_PATH")
+
+# Embedding requests during ingestion: batch limits, parallel requests, API rate limits and retries
+EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 50000))
+EMBEDDING_BATCH_MAX_TEXTS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TEXTS", 1000))
+EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))
+EMBEDDING_REQUESTS_PER_MINUTE: int = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 3000))
+EMBEDDING_TOKENS_PER_MINUTE: int = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", 1000000))
+EMBEDDING_MAX_RETRIES: int = int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+
+# Semantic answer cache for chatbots that opt in (chatbots.answer_cache_enabled)
+ANSWER_CACHE_TTL_SECONDS: int = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 24 * 60 * 60))
+ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))  # per chatbot
+ANSWER_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", 0.95))
+
+# Add a Server-Timing header with the chat pipeline stage durations to chat responses
+SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Upper bound (in bytes) for the in-process cache of loaded vector stores
+VECTOR_STORE_CACHE_MAX_BYTES: int = int(os.getenv("VECTOR_STORE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Maximum number of chatbots whose built conversation chains are kept in memory
+CHAIN_CACHE_MAX_ENTRIES: int = int(os.getenv("CHAIN_CACHE_MAX_ENTRIES", 64))
+
+# Parallel ingestion: download documents in a thread pool and parse PDF, Excel and Word files in a process pool,
+# whose workers also share out the pages of a large PDF
+INGEST_PARALLEL: bool = os.getenv("INGEST_PARALLEL", "false").lower() == "true"
+INGEST_DOWNLOAD_WORKERS: int = int(os.getenv("INGEST_DOWNLOAD_WORKERS", 8))
+INGEST_PARSE_PROCESSES: int = int(os.getenv("INGEST_PARSE_PROCESSES", min(4, os.cpu_count() or 1)))
+
+# Chunks of a document embedded and added to the index at a time, bounds the chunks and vectors an ingestion holds
+INGEST_CHUNK_BATCH_SIZE: int = int(os.getenv("INGEST_CHUNK_BATCH_SIZE", 1000))
+
+# Ingestion job queue: job store ("sqlite", a file shared by the processes of this host, or "supabase", the jobs table),
+# worker threads per process, running jobs per user, queued jobs in total and per user, and how long results are kept
+JOB_STORE: str = os.getenv("JOB_STORE", "sqlite")
+JOB_QUEUE_SQLITE_PATH: str = os.getenv("JOB_QUEUE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "chatbot-jobs.sqlite3"))
+JOB_QUEUE_WORKERS: int = int(os.getenv("JOB_QUEUE_WORKERS", 2))
+JOB_QUEUE_TENANT_CONCURRENCY: int = int(os.getenv("JOB_QUEUE_TENANT_CONCURRENCY", 1))
+JOB_QUEUE_MAX_PENDING: int = int(os.getenv("JOB_QUEUE_MAX_PENDING", 200))
+JOB_QUEUE_MAX_PENDING_PER_TENANT: int = int(os.getenv("JOB_QUEUE_MAX_PENDING_PER_TENANT", 20))
+JOB_QUEUE_POLL_INTERVAL: float = float(os.getenv("JOB_QUEUE_POLL_INTERVAL", 1.0))  # seconds
+JOB_RESULT_TTL_SECONDS: int = int(os.getenv("JOB_RESULT_TTL_SECONDS", 24 * 60 * 60))
+# A running job without a heartbeat for this long (seconds) lost its worker and is queued again, up to JOB_MAX_ATTEMPTS runs
+JOB_STALE_SECONDS: int = int(os.getenv("JOB_STALE_SECONDS", 120))
+JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Jobs act for their user with an access token issued when the job runs, valid this long (seconds)
+JOB_USER_TOKEN_TTL_SECONDS: int = int(os.getenv("JOB_USER_TOKEN_TTL_SECONDS", 60 * 60))
+
+# Chunk size and overlap in tokens for chatbots that use token chunking (chatbots.chunking_strategy)
+CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", 256))
+CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+
+# Index structure of published vector stores: auto (by chunk count), flat, ivf_flat, hnsw, ivf_sq8, ivf_fp16 or ivf_pq
+INDEX_TYPE: str = os.getenv("INDEX_TYPE", "auto")
+# Chunk counts at which auto switches from flat to IVF-Flat, to IVF with 8-bit codes, and to IVF-PQ
+INDEX_FLAT_MAX_VECTORS: int = int(os.getenv("INDEX_FLAT_MAX_VECTORS", 20000))
+INDEX_IVF_FLAT_MAX_VECTORS: int = int(os.getenv("INDEX_IVF_FLAT_MAX_VECTORS", 200000))
+INDEX_IVF_SQ8_MAX_VECTORS: int = int(os.getenv("INDEX_IVF_SQ8_MAX_VECTORS", 2000000))
+
+# Replaced vector index versions stay in storage this long (seconds), for readers still downloading them
+INDEX_VERSION_GRACE_SECONDS: int = int(os.getenv("INDEX_VERSION_GRACE_SECONDS", 600))
+
+# Host-wide directory of downloaded index files, shared by all worker processes, and its size limit
+INDEX_DISK_CACHE_DIR: str = os.getenv("INDEX_DISK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "chatbot-index-cache"))
+INDEX_DISK_CACHE_MAX_BYTES: int = int(os.getenv("INDEX_DISK_CACHE_MAX_BYTES", 4 * 1024 * 1024 * 1024))
+
+
+def create_supabase_client(user_token=None) -> Client:
+    """Create a new, unshared Supabase client"""
     if user_token:
-        logging.info("Creating Supabase client with user token", user_token)
+        logging.info("Creating Supabase client with user token")
         return create_client(
             SUPABASE_URL,
             SUPABASE_SECRET_KEY,
@@ -24,3 +107,37 @@ def get_supabase_client(user_token=None) -> Client:
     else:
         logging.info("Creating Supabase client without user token")
         return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+
+
+# Process-wide pool of Supabase clients: one shared anonymous client plus an LRU of user-scoped
+# clients keyed by token, so repeat requests reuse the clients' keep-alive HTTP connections.
+_anon_client: Optional[Client] = None
+_user_clients: "OrderedDict[str, Client]" = OrderedDict()
+_client_pool_lock = threading.Lock()
+
+
+def get_supabase_client(user_token=None) -> Client:
+    """
+    Get a pooled Supabase client, shared across requests and threads of this process.
+    Do not use it for auth calls (sign in/up) that change the client's session, use create_supabase_client for those.
+    """
+    global _anon_client
+    with _client_pool_lock:
+        if not user_token:
+            if _anon_client is None:
+                _anon_client = create_supabase_client()
+            return _anon_client
+
+        client = _user_clients.get(user_token)
+        if client is not None:
+            _user_clients.move_to_end(user_token)
+            return client
+
+    # Create outside the lock, building a client is not free
+    client = create_supabase_client(user_token)
+    with _client_pool_lock:
+        client = _user_clients.setdefault(user_token, client)
+        _user_clients.move_to_end(user_token)
+        while len(_user_clients) > SUPABASE_CLIENT_POOL_SIZE:
+            _user_clients.popitem(last=False)
+    return client
@@ -20,6 +20,8 @@ create table chatbots (
   user_id uuid references auth.users(id) on delete cascade not null, -- owner
   name text not null,
   description text not null,
+  answer_cache_enabled boolean default false, -- reuse answers to repeated public questions
+  chunking_strategy text check (chunking_strategy in ('character', 'token')) default 'character', -- how documents are split
   created_at timestamp default now(),
   updated_at timestamp default now()
 );
@@ -72,11 +74,33 @@ create table chatbot_visitors (
   created_at timestamp default now()
 );
 
+-- ===========================
+-- JOBS TABLE (Background ingestion jobs, used when JOB_STORE=supabase)
+-- ===========================
+create table jobs (
+  id uuid primary key,
+  tenant_id uuid not null, -- user the job runs for
+  concurrency_key text, -- jobs with the same key (chatbot) run one at a time
+  kind text not null, -- e.g., process_documents
+  payload jsonb not null,
+  status text check (status in ('queued', 'running', 'completed', 'failed')) not null default 'queued',
+  attempts int not null default 0,
+  result jsonb,
+  error text,
+  worker_id text, -- host, process and id of the worker running it
+  created_at timestamp default now(),
+  started_at timestamp,
+  heartbeat_at timestamp,
+  finished_at timestamp,
+  expires_at timestamp -- finished jobs are deleted after this
+);
+
 -- ===========================
 -- INDEXES (Important for performance)
 -- ===========================
 create index idx_chatbots_user_id on chatbots (user_id);
 create index idx_documents_chatbot_id on documents (chatbot_id);
+create index idx_jobs_status on jobs (status, created_at);
 create index idx_chat_sessions_chatbot_id on chat_sessions (chatbot_id);
 create index idx_chats_session_id on chats (session_id);
 create index idx_chatbot_visitors_chatbot_id on chatbot_visitors (chatbot_id);
@@ -88,6 +112,7 @@ alter table chatbots enable row level security;
 alter table documents enable row level security;
 alter table chat_sessions enable row level security;
 alter table chats enable row level security;
+alter table jobs enable row level security; -- no policies, only the workers' service key reads and writes jobs
 
 -- ===========================
 -- POLICIES FOR RLS TABLES
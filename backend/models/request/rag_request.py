@@ -2,3 +2,4 @@ from pydantic import BaseModel
 
 class ProcessDocumentsRequest(BaseModel):
     chatbot_id: str
+    full_rebuild: bool = False  # re-process every document instead of adding the new ones to the index
@@ -9,6 +9,8 @@ class Chatbot(BaseModel):
     description: str
     created_at: str
     updated_at: str
+    answer_cache_enabled: bool = False
+    chunking_strategy: str = "character"
 
 class CreateChatbotResponse(BaseModel):
     id: str
@@ -3,4 +3,5 @@ from pydantic import BaseModel
 
 class ProcessDocumentsResponse(BaseModel):
     processed_count: int
-    failed_urls: List[str]
\ No newline at end of file
+    failed_urls: List[str]
+    embeddings_saved: int = 0  # chunks that were not sent to the embedding model
\ No newline at end of file
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
 from models.request.chat_request import ChatRequest, CreateSessionRequest, GetChatHistoryRequest
 
 class ChatService(ABC):
@@ -8,10 +9,15 @@ class ChatService(ABC):
         pass
 
     @abstractmethod
-    def chat(self, user_id: str, user_token: str, data: ChatRequest) -> tuple[dict, int]:
+    def chat(self, user_id: str, user_token: str, data: ChatRequest, use_answer_cache: bool = False) -> tuple[dict, int]:
         """Process a chat query and return response"""
         pass 
 
+    @abstractmethod
+    def chat_stream(self, user_id: str, user_token: str, data: ChatRequest, use_answer_cache: bool = False) -> Iterator[str]:
+        """Process a chat query and stream the response as Server-Sent Events"""
+        pass
+
     @abstractmethod
     def get_chat_history(self, user_token: str, data: GetChatHistoryRequest) -> tuple[dict, int]:
         """Get chat history for a specific chat session"""
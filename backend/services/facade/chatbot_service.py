@@ -38,6 +38,10 @@ class ChatbotService(ABC):
     def delete_document(self, user_id: str, data: DeleteDocumentRequest) -> tuple:
         pass
 
+    @abstractmethod
+    def update_index_after_delete(self, user_id: str, user_token: str, chatbot_id: str, document_id: str, file_name: str) -> tuple:
+        pass
+
     @abstractmethod
     def rebuild_vector_store(self, user_id: str, user_token: str, chatbot_id: str) -> tuple:
         pass
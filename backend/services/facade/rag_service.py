@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
 from models.request.rag_request import ProcessDocumentsRequest
+from supabase import Client
 
 
 class RAGService(ABC):
     @abstractmethod
     def process_documents_from_urls(self, user_id: str, user_token: str, data: ProcessDocumentsRequest) -> tuple[dict, int]:
         """Process documents from URLs and create/update vector store"""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def remove_document_vectors(self, user_id: str, chatbot_id: str, document_id: str, file_name: str, supabase: Client) -> bool:
+        """Remove one document's vectors from the vector store, returns False if the vector store has to be rebuilt instead"""
+        pass
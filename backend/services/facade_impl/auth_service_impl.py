@@ -1,4 +1,4 @@
-from config import get_supabase_client
+from config import create_supabase_client
 from exceptions.auth_exception import AuthException
 from gotrue.errors import AuthApiError
 from models.request.auth_request import LoginRequest, SignupRequest
@@ -9,7 +9,8 @@ from services.facade.auth_service import AuthService
 
 class AuthServiceImpl(AuthService):
     def __init__(self):
-        self.supabase = get_supabase_client()
+        # Signing in changes the client's session, so auth gets its own client instead of the shared pool
+        self.supabase = create_supabase_client()
 
     def signup(self, data: SignupRequest) -> tuple:
         email = data.get("email")
@@ -1,22 +1,29 @@
 import logging
 import os
-import tempfile
+import queue
+import threading
+import time
 import uuid
+from typing import Iterator, List, Optional
 
-from config import get_supabase_client
+from config import CHAT_WRITE_BEHIND, get_supabase_client
 from dotenv import load_dotenv
-from langchain.chains import ConversationalRetrievalChain
-from langchain.chat_models import ChatOpenAI
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.memory import ConversationBufferMemory
-from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
-
-from langchain.vectorstores import FAISS
 from models.request.chat_request import ChatRequest, CreateSessionRequest, GetChatHistoryRequest
 from models.response.chat_response import ChatResponse, CreateSessionResponse, ChatSessionListResponse
 from models.response.response_wrapper import ErrorResponse, SuccessResponse
 from services.facade.chat_service import ChatService
 from supabase import Client
+from utils.answer_cache import AnswerCache
+from utils.cached_embeddings import CachedEmbeddings
+from utils.chat_message_writer import ChatMessageWriter
+from utils.conversation_chain_factory import ConversationChainFactory
+from utils.index_disk_cache import IndexDiskCache, index_size_bytes, load_vector_store_mmap
+from utils.index_versions import index_location
+from utils.stage_timer import StageTimer, StageTimingCallbackHandler
+from utils.streaming import QueueCallbackHandler, format_sse_event
+from utils.vector_store_cache import VectorStoreCache
 
 BUCKET_NAME = "DOCUMENTS"
 
@@ -33,112 +40,80 @@ class ChatServiceImpl(ChatService):
         if not api_key:
             raise ValueError("Please set OPENAI_API_KEY in the .env file")
         self.supabase = get_supabase_client(user_token)
-        self.embeddings = OpenAIEmbeddings()
+        self.embeddings = CachedEmbeddings(OpenAIEmbeddings())
         self.vector_store = None
         self.conversation_chain = None
         self.memory = None
+        self.index_version = None
+        self.stage_timer = StageTimer()
 
 
-    def _load_vector_store_from_supabase(self, user_id: str, chatbot_id: str, supabase: Client):
-        """Load vector store from Supabase URLs"""
-        # There are two files saved, index.faiss and index.pkl
+    def _load_vector_store_from_supabase(self, chatbot_id: str, storage_path: str, version: str, supabase: Client):
+        """Load vector store from Supabase URLs, reusing the process-wide cache when the index version is unchanged"""
+        # There are two files saved, index.faiss and chunks.bin (index.pkl for indexes published before it)
         # index.faiss: contains the actual vector embeddings, stores the numerical vectors in FAISS's optimized format, used for similarity searching.
-        # index.pkl: contains the metadata and mapping information, stores the original texts and their metadata, maps vectors back to their original content.
-        # .faiss is "search engine" part and .pkl is lookup table.
+        # chunks.bin: contains the original texts and their metadata, packed in the same order as the vectors.
+        # .faiss is "search engine" part and chunks.bin is lookup table.
         # index.faiss:
         # [0.1, 0.2, 0.3, ...] -> Vector ID: 1
         # [0.4, 0.5, 0.6, ...] -> Vector ID: 2
         # [0.7, 0.8, 0.9, ...] -> Vector ID: 3
-        # index.pkl:
+        # chunks.bin:
         # Vector ID: 1 -> {"text": "This is the first document", "source": "doc1.pdf"}
         # Vector ID: 2 -> {"text": "This is the second document", "source": "doc2.pdf"}
         # Vector ID: 3 -> {"text": "This is the third document", "source": "doc3.pdf"}
 
         # Without .faiss, you can't perform similarity searches
-        # Without .pkl, you can't retrieve the original content that matches the vectors
+        # Without chunks.bin, you can't retrieve the original content that matches the vectors
         try:
-            storage_faiss_path = f"{user_id}/{chatbot_id}/rag-vector/index.faiss"
-            storage_pkl_path = f"{user_id}/{chatbot_id}/rag-vector/index.pkl"
+            # Repeat turns on the same index version skip the storage round-trip entirely
+            cache = VectorStoreCache()
+            cached_vector_store = cache.get(chatbot_id, version)
+            if cached_vector_store is not None:
+                self.vector_store = cached_vector_store
+                logging.info(f"Vector store for chatbot {chatbot_id} served from cache")
+                self._initialize_conversation_chain(chatbot_id, version)
+                return
 
-            # Create a temporary directory
             # FAISS needs actual files on disk because:
             # 1. It memory-maps the index file (.faiss) for efficient similarity searches
-            # 2. It uses Python's pickle module to load the metadata (.pkl)
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Download files directly from Supabase bucket
-                faiss_data = supabase.storage.from_(BUCKET_NAME).download(storage_faiss_path)
-                pkl_data = supabase.storage.from_(BUCKET_NAME).download(storage_pkl_path)
-                
-                faiss_path = os.path.join(temp_dir, "index.faiss")
-                pkl_path = os.path.join(temp_dir, "index.pkl")
-                
-                # Save files temporarily
-                with open(faiss_path, 'wb') as f:
-                    f.write(faiss_data)
-                with open(pkl_path, 'wb') as f:
-                    f.write(pkl_data)
-                
-                # Load vector store from temporary files
-                self.vector_store = FAISS.load_local(temp_dir, self.embeddings)
-                logging.info("Vector store loaded successfully")
-                self._initialize_conversation_chain()
+            # 2. It memory-maps the chunk store too and only decodes the chunks a search returns
+            # The files are kept in a host-wide cache directory keyed by storage path and index version,
+            # so each version is downloaded once per host and every worker process maps the same files.
+            with self.stage_timer.stage("index_download"):
+                index_dir = IndexDiskCache().get_index_dir(
+                    storage_path,
+                    version,
+                    lambda path: supabase.storage.from_(BUCKET_NAME).download(path)
+                )
+
+            # Load vector store from the cached files
+            with self.stage_timer.stage("index_load"):
+                self.vector_store = load_vector_store_mmap(index_dir, self.embeddings)
+            logging.info("Vector store loaded successfully")
+            cache.put(chatbot_id, version, self.vector_store, index_size_bytes(index_dir))
+            self._initialize_conversation_chain(chatbot_id, version)
                 
         except Exception as e:
             logging.error(f"Error loading vector store from Supabase: {str(e)}")
             raise
 
 
-    def _initialize_conversation_chain(self):
+    def _initialize_conversation_chain(self, chatbot_id: str, version: str):
         if self.vector_store:
-            # Define your custom system template
-            system_template = """
-            You are a helpful AI assistant. Use the following pieces of context to answer the user's questions.
-            Always try to answer the question based on the context (the documents/vectors you have access to) and the current conversation.
-            If the context given is not relevant to the question, and the question is general, just answer it based on your knowledge.
-            If the context given is not relevant to the question, and the question is specific, just notify the user to be more specific.
-            You must reply in English all the time.
-            
-            When answering questions about tables, format the information clearly:
-            1. For simple lookups, present the specific cell values requested
-            2. For summarizing table data, organize information by rows or columns
-            3. When presenting tabular data, keep the original structure where appropriate
-            4. If the table has column headers, use them in your explanations
-            
-            Context: {context}
-            
-            Current conversation:
-            {chat_history}
-            """
-            
-            # Create prompt templates
-            system_message_prompt = SystemMessagePromptTemplate.from_template(system_template)
-            human_template = "{question}"
-            human_message_prompt = HumanMessagePromptTemplate.from_template(human_template)
-            
-            chat_prompt = ChatPromptTemplate.from_messages([
-                system_message_prompt,
-                human_message_prompt,
-            ])
-            
-            # Configure advanced retrieval parameters to improve table retrieval
-            retriever = self.vector_store.as_retriever(
-                search_type="mmr",
-                search_kwargs={
-                    "k": 3,
-                }
-            )
-            
-            self.conversation_chain = ConversationalRetrievalChain.from_llm(
-                llm=ChatOpenAI(temperature=0.7, model_name="gpt-4o-mini"),
-                retriever=retriever,
-                memory=self.memory,
-                combine_docs_chain_kwargs={"prompt": chat_prompt},
-                verbose=True
-            )
-            logging.info("Conversation chain initialization completed")
+            # Prompt, retriever and LLM clients are built once per chatbot index version and shared across requests,
+            # only the per-session memory is attached per request (see _chain_inputs)
+            self.conversation_chain = ConversationChainFactory().get_chain(chatbot_id, version, self.vector_store)
         else:
             logging.error("Cannot initialize chain without vector store")
 
+    def _chain_inputs(self, query: str) -> dict:
+        """Inputs for the shared conversation chain, with this session's history taken from memory"""
+        return {
+            "question": query,
+            "chat_history": self.memory.chat_memory.messages,
+        }
+
 
     def _load_conversation_memory(self, chatbot_id: str, session_id: str, supabase: Client):
         """Load previous conversations into memory"""
@@ -161,6 +136,11 @@ class ChatServiceImpl(ChatService):
                 .order('created_at') \
                 .execute()
             
+            # In write-behind mode the latest messages may still be queued, add them after the stored ones
+            if CHAT_WRITE_BEHIND:
+                for row in ChatMessageWriter().pending_messages(chatbot_id, session_id):
+                    (user_result.data if row['user_type'] == 'user' else ai_result.data).append(row)
+
             if not (user_result.data or ai_result.data):
                 logging.info("No conversation history found for this chat")
             else:
@@ -181,19 +161,28 @@ class ChatServiceImpl(ChatService):
 
     def _save_message(self, chatbot_id: str, session_id: str, is_user: bool, message: str, supabase: Client):
         """Save a message to the chats table """
+        start = time.perf_counter()
         try:
-            # add a new row to the chats table
-            supabase.table('chats').insert({
+            row = {
                 'id': str(uuid.uuid4()),
                 'chatbot_id': chatbot_id,
                 'session_id': session_id,
                 'user_type': 'user' if is_user else 'bot',
                 'message': message,
-            }).execute()
+            }
+            if CHAT_WRITE_BEHIND:
+                # queue the row, it is written in a batched insert off the request path
+                ChatMessageWriter().enqueue(supabase, row)
+                logging.info(f"Queued {'user' if is_user else 'AI'} message for chat session {session_id}")
+                return
+            # add a new row to the chats table
+            supabase.table('chats').insert(row).execute()
             logging.info(f"Saved {'user' if is_user else 'AI'} message to chat session {session_id}")
         except Exception as e:
             logging.error(f"Error saving message to chat session {session_id}: {str(e)}")
             raise  # Re-raise to handle in the calling function
+        finally:
+            self.stage_timer.add("message_insert", time.perf_counter() - start)
 
     def create_session(self, data: CreateSessionRequest) -> tuple[dict, int]:
         """Create a new chat session"""
@@ -278,23 +267,20 @@ class ChatServiceImpl(ChatService):
                 message="Failed to retrieve chat sessions"
             ).model_dump(), 500
 
-    def chat(self, user_id: str, user_token: str, data: ChatRequest) -> tuple[dict, int]:
-        """Process user query and return response"""
-        supabase = get_supabase_client(user_token)
-        chatbot_id = data.chatbot_id
-        session_id = data.session_id
-        query = data.query
+    def _prepare_conversation(self, user_id: str, chatbot_id: str, session_id: str, supabase: Client) -> Optional[tuple[dict, int]]:
+        """Load the vector store, conversation chain and history for a chat turn, returns an error response if the chatbot has no vector store"""
         # Check if vector store exists in Supabase
         try:
             # Create fresh memory instance for each chat
             self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
             # Log the chatbot we're trying to use
             logging.info(f"Attempting to use chatbot: {chatbot_id}")
-            result = supabase.table('documents') \
-                .select('*') \
-                .eq('chatbot_id', chatbot_id) \
-                .eq('file_type', 'faiss') \
-                .execute()
+            with self.stage_timer.stage("document_lookup"):
+                result = supabase.table('documents') \
+                    .select('*') \
+                    .eq('chatbot_id', chatbot_id) \
+                    .eq('file_type', 'faiss') \
+                    .execute()
             
             # Log what we found
             if result.data:
@@ -311,20 +297,71 @@ class ChatServiceImpl(ChatService):
             
             # Before loading the vector store
             logging.info(f"Loading vector store from storage for chatbot {chatbot_id}")
-            self._load_vector_store_from_supabase(user_id, chatbot_id, supabase)
+            # The faiss row points to the current index version, publishing a new index switches it
+            storage_path, index_version = index_location(result.data[0])
+            self.index_version = index_version
+            self._load_vector_store_from_supabase(chatbot_id, storage_path, index_version, supabase)
             logging.info(f"Successfully loaded vector store for chatbot {chatbot_id}")
-            self._load_conversation_memory(chatbot_id, session_id, supabase)
+            with self.stage_timer.stage("history_load"):
+                self._load_conversation_memory(chatbot_id, session_id, supabase)
             logging.info(f"Loaded conversation memory for session {session_id}")
         except Exception as e:
             logging.error(f"Failed to load existing vector store or conversation history: {str(e)}")
+        return None
+
+    def _lookup_cached_answer(self, chatbot_id: str, query: str, use_answer_cache: bool) -> tuple[Optional[str], Optional[List[float]]]:
+        """
+        Look a question up in the chatbot's answer cache.
+        Only sessions without history are eligible, since follow-up questions depend on the conversation.
+        Returns the cached answer (or None) and the query embedding to store the fresh answer under.
+        """
+        if not use_answer_cache or self.index_version is None or self.memory.chat_memory.messages:
+            return None, None
+        try:
+            with self.stage_timer.stage("answer_cache_lookup"):
+                query_embedding = self.embeddings.embed_query(query)
+                return AnswerCache().lookup(chatbot_id, self.index_version, query_embedding), query_embedding
+        except Exception as e:
+            logging.warning(f"Answer cache lookup failed, falling back to the model: {str(e)}")
+            return None, None
+
+    def _record_stage_timings(self, chatbot_id: str, request_start: float):
+        """Log the stage timings of this request and add them to the latency histogram"""
+        self.stage_timer.add("total", time.perf_counter() - request_start)
+        self.stage_timer.finish(f"chat with chatbot {chatbot_id}")
+
+    def chat(self, user_id: str, user_token: str, data: ChatRequest, use_answer_cache: bool = False) -> tuple[dict, int]:
+        """Process user query and return response"""
+        request_start = time.perf_counter()
+        try:
+            return self._chat(user_id, user_token, data, use_answer_cache)
+        finally:
+            self._record_stage_timings(data.chatbot_id, request_start)
+
+    def _chat(self, user_id: str, user_token: str, data: ChatRequest, use_answer_cache: bool) -> tuple[dict, int]:
+        supabase = get_supabase_client(user_token)
+        chatbot_id = data.chatbot_id
+        session_id = data.session_id
+        query = data.query
+
+        error_response = self._prepare_conversation(user_id, chatbot_id, session_id, supabase)
+        if error_response:
+            return error_response
 
         try:
             # Save user message first
             self._save_message(chatbot_id, session_id, True, query, supabase)
             
-            # Get AI response
-            result = self.conversation_chain({"question": query})
-            answer = result.get("answer", "Sorry, I couldn't find relevant information.")
+            # Get AI response, from the answer cache when possible
+            answer, query_embedding = self._lookup_cached_answer(chatbot_id, query, use_answer_cache)
+            if answer is None:
+                result = self.conversation_chain(
+                    self._chain_inputs(query),
+                    callbacks=[StageTimingCallbackHandler(self.stage_timer)]
+                )
+                answer = result.get("answer", "Sorry, I couldn't find relevant information.")
+                if query_embedding is not None:
+                    AnswerCache().store(chatbot_id, self.index_version, query_embedding, answer)
             
             self._save_message(chatbot_id, session_id, False, answer, supabase)
 
@@ -341,6 +378,104 @@ class ChatServiceImpl(ChatService):
                 message="An error occurred while processing your request"
             ).model_dump(), 500
 
+    def chat_stream(self, user_id: str, user_token: str, data: ChatRequest, use_answer_cache: bool = False) -> Iterator[str]:
+        """
+        Process user query and stream the answer as Server-Sent Events.
+        Emits a `token` event per generated token, then a `done` event with the full answer,
+        or an `error` event if the turn could not be processed.
+        """
+        request_start = time.perf_counter()
+        try:
+            yield from self._chat_stream(user_id, user_token, data, use_answer_cache)
+        finally:
+            self._record_stage_timings(data.chatbot_id, request_start)
+
+    def _chat_stream(self, user_id: str, user_token: str, data: ChatRequest, use_answer_cache: bool) -> Iterator[str]:
+        supabase = get_supabase_client(user_token)
+        chatbot_id = data.chatbot_id
+        session_id = data.session_id
+        query = data.query
+
+        error_response = self._prepare_conversation(user_id, chatbot_id, session_id, supabase)
+        if error_response:
+            yield format_sse_event("error", error_response[0])
+            return
+
+        try:
+            # Save user message first
+            self._save_message(chatbot_id, session_id, True, query, supabase)
+        except Exception as e:
+            logging.error(f"Error processing query: {str(e)}")
+            yield format_sse_event("error", ErrorResponse(
+                message="An error occurred while processing your request"
+            ).model_dump())
+            return
+
+        answer, query_embedding = self._lookup_cached_answer(chatbot_id, query, use_answer_cache)
+        if answer is not None:
+            # A cached answer is complete already, send it as a single token
+            try:
+                self._save_message(chatbot_id, session_id, False, answer, supabase)
+            except Exception as e:
+                logging.error(f"Error processing query: {str(e)}")
+                yield format_sse_event("error", ErrorResponse(
+                    message="An error occurred while processing your request"
+                ).model_dump())
+                return
+            yield format_sse_event("token", {"token": answer})
+            yield format_sse_event("done", SuccessResponse(
+                data=ChatResponse(
+                    answer=answer
+                ).model_dump(),
+                message="Chat response generated successfully"
+            ).model_dump())
+            return
+
+        token_queue = queue.Queue()
+        outcome = {}
+
+        def run_chain():
+            # Runs in a worker thread so tokens can be yielded while the model is still generating.
+            # The bot message is saved here so it is persisted even if the client disconnects mid-stream.
+            try:
+                result = self.conversation_chain(
+                    self._chain_inputs(query),
+                    callbacks=[QueueCallbackHandler(token_queue), StageTimingCallbackHandler(self.stage_timer)]
+                )
+                answer = result.get("answer", "Sorry, I couldn't find relevant information.")
+                if query_embedding is not None:
+                    AnswerCache().store(chatbot_id, self.index_version, query_embedding, answer)
+                self._save_message(chatbot_id, session_id, False, answer, supabase)
+                outcome['answer'] = answer
+            except Exception as e:
+                logging.error(f"Error processing query: {str(e)}")
+                outcome['error'] = e
+            finally:
+                token_queue.put(None)  # Signal the end of the stream
+
+        worker = threading.Thread(target=run_chain, daemon=True)
+        worker.start()
+
+        while True:
+            token = token_queue.get()
+            if token is None:
+                break
+            yield format_sse_event("token", {"token": token})
+        worker.join()
+
+        if 'error' in outcome:
+            yield format_sse_event("error", ErrorResponse(
+                message="An error occurred while processing your request"
+            ).model_dump())
+            return
+
+        yield format_sse_event("done", SuccessResponse(
+            data=ChatResponse(
+                answer=outcome['answer']
+            ).model_dump(),
+            message="Chat response generated successfully"
+        ).model_dump())
+
 
     def get_chat_history(self, user_token: str, data: GetChatHistoryRequest) -> tuple[dict, int]:
         """Get chat history for a specific chat session"""
@@ -355,6 +490,11 @@ class ChatServiceImpl(ChatService):
                 .order('created_at') \
                 .execute()
 
+            if CHAT_WRITE_BEHIND:
+                result.data.extend(
+                    {'message': row['message']} for row in ChatMessageWriter().pending_messages(chatbot_id, session_id)
+                )
+
             if not result.data:
                 return SuccessResponse(
                     data={"messages": []},
@@ -1,10 +1,14 @@
 import uuid
 from models.request.chatbot_request import UploadDocumentRequest, DeleteDocumentRequest
+from models.request.rag_request import ProcessDocumentsRequest
 from config import get_supabase_client
 from exceptions.database_exception import DatabaseException
 from models.response.chatbot_response import ChatbotListResponse, DocumentListResponse, Chatbot, CreateChatbotResponse
 from models.response.response_wrapper import SuccessResponse, ErrorResponse
 from services.facade.chatbot_service import ChatbotService
+from services.facade_impl.rag_service_impl import RAGServiceImpl
+from utils.cache_invalidation import invalidate_chatbot_caches
+from utils.text_chunking import CHARACTER_CHUNKING, CHUNKING_STRATEGIES
 import logging
 
 BUCKET_NAME = "DOCUMENTS"
@@ -84,7 +88,9 @@ class ChatbotServiceImpl(ChatbotService):
                 name=response.data["name"],
                 description=response.data["description"],
                 created_at=response.data["created_at"],
-                updated_at=response.data["updated_at"]
+                updated_at=response.data["updated_at"],
+                answer_cache_enabled=bool(response.data.get("answer_cache_enabled")),
+                chunking_strategy=response.data.get("chunking_strategy") or CHARACTER_CHUNKING
             )
             logging.info(f"Chatbot fetched successfully: {chatbot_response}")
             
@@ -98,7 +104,7 @@ class ChatbotServiceImpl(ChatbotService):
             raise DatabaseException("Error fetching chatbot", data={"error": str(e)})
         
     def update_chatbot(self, chatbot_id: str, data: dict) -> tuple:
-        """Update a chatbot's name and description"""
+        """Update a chatbot's name, description and settings"""
         logging.info(f"Updating chatbot {chatbot_id} with data: {data}")
         try:
             # Update only the name and description fields
@@ -106,6 +112,16 @@ class ChatbotServiceImpl(ChatbotService):
                 "name": data.get("name"),
                 "description": data.get("description"),
             }
+            # Optional settings are only changed when sent
+            if "answer_cache_enabled" in data:
+                update_data["answer_cache_enabled"] = bool(data["answer_cache_enabled"])
+            if "chunking_strategy" in data:
+                # Applies to documents processed from now on, a full rebuild splits the others again
+                if data["chunking_strategy"] not in CHUNKING_STRATEGIES:
+                    return ErrorResponse(
+                        message=f"chunking_strategy must be one of {', '.join(CHUNKING_STRATEGIES)}"
+                    ).model_dump(), 400
+                update_data["chunking_strategy"] = data["chunking_strategy"]
             response = (
                 self.supabase.table("chatbots")
                 .update(update_data)
@@ -122,6 +138,8 @@ class ChatbotServiceImpl(ChatbotService):
                     description=updated["description"],
                     created_at=updated["created_at"],
                     updated_at=updated["updated_at"],
+                    answer_cache_enabled=bool(updated.get("answer_cache_enabled")),
+                    chunking_strategy=updated.get("chunking_strategy") or CHARACTER_CHUNKING,
                 )
                 logging.info(f"Chatbot updated successfully: {chatbot_response}")
                 return SuccessResponse(
@@ -139,13 +157,17 @@ class ChatbotServiceImpl(ChatbotService):
         """Delete chatbot and all associated documents."""
         try:
             folders = [f"{user_id}/{chatbot_id}/document/", f"{user_id}/{chatbot_id}/rag-vector/"]
-            for folder_path in folders:
+            while folders:
+                folder_path = folders.pop()
                 files = self.supabase.storage.from_(BUCKET_NAME).list(folder_path)
-                file_paths = [f"{folder_path}{file['name']}" for file in files if 'name' in file]
+                # Index versions are stored in sub folders, which are listed without an id
+                folders += [f"{folder_path}{file['name']}/" for file in files if 'name' in file and file.get('id') is None]
+                file_paths = [f"{folder_path}{file['name']}" for file in files if 'name' in file and file.get('id') is not None]
                 if file_paths:
                     self.supabase.storage.from_(BUCKET_NAME).remove(file_paths)
             self.supabase.table("chatbots").delete().eq("id", chatbot_id).execute()
             self.supabase.table("documents").delete().eq("chatbot_id", chatbot_id).execute()
+            invalidate_chatbot_caches(chatbot_id)
             logging.info(f"Chatbot {chatbot_id} and its folder deleted successfully.")
             return SuccessResponse(message="Chatbot deleted successfully.").model_dump(),200
         except Exception as e:
@@ -248,24 +270,46 @@ class ChatbotServiceImpl(ChatbotService):
             # Delete the document from the database
             self.supabase.table("documents").delete().eq("id", document_id).execute()
             
-            # We need to rebuild the vector store, so:
+            # The index is updated by a queued job, see update_index_after_delete
+            return SuccessResponse(
+                message="Document deleted successfully.",
+                data={"file_name": file_name}
+            ).model_dump(), 200
+
+        except Exception as e:
+            logging.error(f"Error deleting document: {str(e)}")
+            raise DatabaseException("Error deleting document", data={"error": str(e)})
+
+    def update_index_after_delete(self, user_id: str, user_token: str, chatbot_id: str, document_id: str, file_name: str) -> tuple:
+        try:
+            # Remove only this document's vectors from the index, the other documents stay indexed
+            try:
+                index_updated = RAGServiceImpl().remove_document_vectors(
+                    user_id, chatbot_id, document_id, file_name, self.supabase
+                )
+            except Exception as index_error:
+                logging.warning(f"Error removing document vectors, falling back to a rebuild: {str(index_error)}")
+                index_updated = False
+
+            if index_updated:
+                return SuccessResponse(
+                    message="Document removed from the vector store.",
+                    data={"requires_reprocessing": False}
+                ).model_dump(), 200
+
+            # Otherwise we need to rebuild the vector store, so:
             # 1. Delete the existing vector store files if they exist
-            vector_paths = [
-                f"{user_id}/{chatbot_id}/rag-vector/index.faiss",
-                f"{user_id}/{chatbot_id}/rag-vector/index.pkl"
-            ]
-            
             # Check if vector files exist before attempting to delete
             vector_docs = self.supabase.table("documents") \
-                .select("id") \
+                .select("id, bucket_path") \
                 .eq("chatbot_id", chatbot_id) \
-                .in_("file_name", ["index.faiss", "index.pkl"]) \
+                .in_("file_type", ["faiss", "pkl"]) \
                 .execute()
                 
             if vector_docs.data:
                 # Delete vector files from storage
                 try:
-                    self.supabase.storage.from_(BUCKET_NAME).remove(vector_paths)
+                    self.supabase.storage.from_(BUCKET_NAME).remove([doc["bucket_path"] for doc in vector_docs.data])
                 except Exception as storage_error:
                     logging.warning(f"Error removing vector files from storage: {str(storage_error)}")
                 
@@ -273,8 +317,9 @@ class ChatbotServiceImpl(ChatbotService):
                 self.supabase.table("documents") \
                     .delete() \
                     .eq("chatbot_id", chatbot_id) \
-                    .in_("file_name", ["index.faiss", "index.pkl"]) \
+                    .in_("file_type", ["faiss", "pkl"]) \
                     .execute()
+                invalidate_chatbot_caches(chatbot_id)
             
             # 2. Mark all remaining documents for this chatbot as unprocessed
             self.supabase.table("documents") \
@@ -284,21 +329,16 @@ class ChatbotServiceImpl(ChatbotService):
                 .neq("file_type", "pkl") \
                 .execute()
             
-            return SuccessResponse(
-                message="Document deleted successfully. Vector store needs manual rebuilding.",
-                data={"requires_reprocessing": True}
-            ).model_dump(), 200
+            # 3. Process every remaining document again
+            return self.rebuild_vector_store(user_id, user_token, chatbot_id)
         
         except Exception as e:
-            logging.error(f"Error deleting document: {str(e)}")
-            raise DatabaseException("Error deleting document", data={"error": str(e)})
+            logging.error(f"Error updating the vector store: {str(e)}")
+            raise DatabaseException("Error updating the vector store", data={"error": str(e)})
             
     
     def rebuild_vector_store(self, user_id: str, user_token: str, chatbot_id: str) -> tuple:
         try:
-            from services.facade_impl.rag_service_impl import RAGServiceImpl
-            from models.request.rag_request import ProcessDocumentsRequest
-
             # Create a new RAG service instance
             rag_service = RAGServiceImpl()
 
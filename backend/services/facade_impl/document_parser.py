@@ -0,0 +1,52 @@
+from concurrent.futures import Executor
+from typing import Iterator, Optional
+
+import chardet
+from services.facade_impl.csv_processor import CSVProcessor
+from services.facade_impl.excel_processor import ExcelProcessor
+from services.facade_impl.pdf_processor import PDFProcessor
+from services.facade_impl.word_processor import WordProcessor
+
+# File types whose parsing is CPU-heavy enough to be worth running in a worker process
+CPU_BOUND_FILE_TYPES = {'.pdf', '.xlsx', '.xls', '.docx', '.doc'}
+
+
+def parse_document_file(file_path: str, file_type: str) -> str:
+    """
+    Extract the text of a downloaded document.
+    Kept at module level with few imports, so it can run in the ingestion process pool.
+
+    Args:
+        file_path: path of the local copy of the document
+        file_type: lower case extension including the dot, e.g. .pdf
+    """
+    if file_type == '.txt':
+        # Try to detect encoding
+        with open(file_path, 'rb') as f:
+            raw_data = f.read()
+            result = chardet.detect(raw_data)
+            encoding = result['encoding'] if result['encoding'] else 'utf-8'
+
+        with open(file_path, 'r', encoding=encoding) as f:
+            return f.read()
+    elif file_type == '.pdf':
+        return PDFProcessor(file_path).process_file()
+    elif file_type == '.csv':
+        return CSVProcessor(file_path).process_file()
+    elif file_type == '.xlsx' or file_type == '.xls':
+        return ExcelProcessor(file_path).process_file()
+    elif file_type == '.docx' or file_type == '.doc':
+        return WordProcessor(file_path).process_file()
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+
+def iter_pdf_pages(file_path: str, executor: Optional[Executor] = None) -> Iterator[tuple[int, str]]:
+    """
+    Extract a PDF page by page, yielding (page number, text), see PDFProcessor.iter_pages.
+
+    Args:
+        file_path: path of the local copy of the PDF
+        executor: process pool that extracts the pages of a large PDF in parallel
+    """
+    return PDFProcessor(file_path).iter_pages(executor)
@@ -1,12 +1,45 @@
-import pdfplumber
 import re
+import threading
+from collections import deque
+
+import numpy as np
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+# Pages each worker process extracts when a PDF is processed in parallel, enough that opening
+# the file in every worker is a small part of the work
+PAGES_PER_RANGE = 16
+
+# Ranges handed to worker processes ahead of the page being read, bounds the extracted pages waiting in memory
+RANGES_IN_FLIGHT = 8
+
+# How deep to look into form XObjects for lines and curves, pdfplumber reads nested forms as well
+FORM_DEPTH = 5
+
+# pdfium is not thread-safe, ingestion threads of one process take turns reading with it
+_pdfium_lock = threading.Lock()
+
 
 class PDFProcessor:
-    def __init__(self, file_path):
+    def __init__(self, file_path, fast_text_pages=True):
         self.file_path = file_path
+        # read pages without lines or curves with pdfium, skipping the table pipeline
+        self.fast_text_pages = fast_text_pages
         # store the table numbers that have been processed (used for skipping table that is a continuation of a table from the previous page)
         self.processed_tables = set()
         self.content_per_page = {}
+        # the open PDF and the tables extracted from each of its pages, so every page is parsed once
+        self.pdf = None
+        self.page_count = 0
+        self.tables_per_page = {}
+        # layouts of the pages loaded ahead of the current one, see _load_pages
+        self.layouts = {}
+        self.loaded_until = 0
+        # the executor extracting page ranges in parallel and its ranges not loaded yet
+        self.executor = None
+        self.pending_ranges = deque()
+        self.next_range_start = 0
 
     # =======================================================================
     # Helper functions for extracting text from tables in the current page
@@ -127,47 +160,56 @@ class PDFProcessor:
         
         return merged_table
 
+    def _page_tables(self, page_num):
+        """Tables of a page, extracted once per page and shared by every lookup of the same processing run."""
+        self._load_pages(page_num)
+        if page_num not in self.tables_per_page:
+            self.tables_per_page[page_num] = self.pdf.pages[page_num].extract_tables()
+        tables = self.tables_per_page[page_num]
+        if isinstance(tables, str):
+            # extracting them failed in a worker process
+            raise Exception(tables)
+        return tables
+
     def _extract_table(self, page_num, table_num):
         """Extract a specific table from a page and check for continuation."""
         try:
-            with pdfplumber.open(self.file_path) as pdf:
-                if page_num >= len(pdf.pages):
-                    return None
-                    
-                table_page = pdf.pages[page_num]
-                tables = table_page.extract_tables()
-                
-                # Safety check for table number
-                if not tables or table_num >= len(tables):
-                    return None
-                    
-                # Obtain the current table
-                current_table = tables[table_num]
-                
-                # Safety check for empty table
-                if not current_table or len(current_table) == 0:
-                    return None
-                
-                # Check if the current table continues on next page
-                # 0. make sure the current table is the last table of the page so there is chance for continuation
-                if table_num == len(tables)-1:
-                    # 1. check if there are still pages left
-                    if page_num + 1 < len(pdf.pages):
-                        next_page = pdf.pages[page_num + 1]
-                        next_page_tables = next_page.extract_tables()
-                        # 2. check if the next page has tables
-                        if next_page_tables and len(next_page_tables) > 0:
-                            # 3. check if the current table continues on the next page
-                            if self._is_table_continued(current_table, next_page_tables[0]):
-                                # 4. Recursively extract and merge with continuation
-                                continuation = self._extract_table(page_num + 1, 0)
-                                if continuation:
-                                    self.processed_tables.add((page_num + 1, 0))
-                                    # 5. merge the current table with the continuation
-                                    return self._merge_tables(current_table, continuation)
-                
-                # Merge split rows within the table
-                return self._format_table(current_table)
+            if page_num >= self.page_count:
+                return None
+
+            tables = self._page_tables(page_num)
+
+            # Safety check for table number
+            if not tables or table_num >= len(tables):
+                return None
+
+            # Obtain the current table
+            current_table = tables[table_num]
+
+            # Safety check for empty table
+            if not current_table or len(current_table) == 0:
+                return None
+
+            # Follow the table across pages: it can only continue when it is the last table of its page
+            # and the next page starts with a table of the same shape, which can continue in turn
+            chain = [current_table]
+            chain_page, chain_table_num, chain_tables = page_num, table_num, tables
+            while chain_table_num == len(chain_tables) - 1 and chain_page + 1 < self.page_count:
+                next_page_tables = self._page_tables(chain_page + 1)
+                if not next_page_tables or not next_page_tables[0]:
+                    break
+                if not self._is_table_continued(chain[-1], next_page_tables[0]):
+                    break
+                chain.append(next_page_tables[0])
+                chain_page, chain_table_num, chain_tables = chain_page + 1, 0, next_page_tables
+                self.processed_tables.add((chain_page, 0))
+
+            # Merge from the last page backwards, each table with the already merged rest,
+            # and merge split rows within the table
+            merged = self._format_table(chain[-1])
+            for table in reversed(chain[:-1]):
+                merged = self._merge_tables(table, merged)
+            return merged
         except Exception as e:
             print(f"Error extracting table from page {page_num}, table {table_num}: {str(e)}")
             return None
@@ -222,101 +264,247 @@ class PDFProcessor:
             "min_words_horizontal": 1
         }
 
+    def _read_text_only_pages(self, start, end):
+        """
+        Text of the pages from start to end - 1 that have no lines or curves, keyed by page number.
+        Such a page cannot hold a ruled table, so pdfium reads its text directly, much faster than
+        pdfplumber parses the page. The text takes the table pipeline's form: words in reading order,
+        each followed by a space. Pages pdfium cannot read are left to the table pipeline.
+        """
+        texts = {}
+        if not self.fast_text_pages:
+            return texts
+        with _pdfium_lock:
+            try:
+                document = pdfium.PdfDocument(self.file_path)
+            except Exception as e:
+                print(f"Error reading PDF file with pdfium: {str(e)}")
+                return texts
+            try:
+                for pagenum in range(start, end):
+                    page = document[pagenum]
+                    try:
+                        paths = page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH], max_depth=FORM_DEPTH)
+                        if next(paths, None) is not None:
+                            continue
+                        textpage = page.get_textpage()
+                        try:
+                            text = textpage.get_text_bounded()
+                        finally:
+                            textpage.close()
+                        texts[pagenum] = "".join(word + " " for word in text.split())
+                    except Exception as e:
+                        print(f"Error reading page {pagenum} with pdfium: {str(e)}")
+                    finally:
+                        page.close()
+            finally:
+                document.close()
+        return texts
+
     # =======================================================================
     # Main function for extracting text and tables in pdf
     # =======================================================================
 
-    def process_file(self):
-        """Process PDF and extract text and tables."""
+    def _text_with_table_markers(self, words, bboxes):
+        """
+        Words outside the tables and a [[TABLE]] marker for each table, ordered top to bottom.
+        A word belongs to a table when its midpoint lies in the table's bounding box. All words are
+        tested against all tables at once on arrays, dense pages have thousands of words and many tables.
+        """
+        if not words:
+            return "\n[[TABLE]]\n" * len(bboxes)
+
+        positions = np.array([(word["x0"], word["x1"], word["top"], word["bottom"]) for word in words], dtype=np.float64)
+        h_mid = (positions[:, 0] + positions[:, 1]) / 2
+        v_mid = (positions[:, 2] + positions[:, 3]) / 2
+        if bboxes:
+            # words x tables: is the word's midpoint in the table
+            boxes = np.array(bboxes, dtype=np.float64)
+            in_any_table = (
+                (h_mid[:, None] >= boxes[:, 0]) & (h_mid[:, None] < boxes[:, 2]) &
+                (v_mid[:, None] >= boxes[:, 1]) & (v_mid[:, None] < boxes[:, 3])
+            ).any(axis=1)
+            kept = np.flatnonzero(~in_any_table)
+            marker_tops = boxes[:, 1]
+        else:
+            kept = np.arange(len(words))
+            marker_tops = np.empty(0, dtype=np.float64)
+
+        # Merge words and markers by vertical position, the stable sort keeps the words' reading order
+        # and puts a marker after the words at the same height
+        contents = [words[i]["text"] + " " for i in kept] + ["\n[[TABLE]]\n"] * len(marker_tops)
+        order = np.argsort(np.concatenate([positions[kept, 2], marker_tops]), kind="stable")
+        return "".join(contents[i] for i in order)
+
+    def _page_layout(self, pagenum, page):
+        """
+        Find the tables of a page and place a [[TABLE]] marker for each one among the page's words.
+        Returns (number of tables, text), the text is None when reading the words failed
+        and both are None when finding the tables failed.
+        """
         try:
-            with pdfplumber.open(self.file_path) as pdf:
-                # store the text from all tables in the pdf
-                text_from_tables = []
-                # store the pure text and table markers for each page
-                pure_texts = []
-                
-                for pagenum, page in enumerate(pdf.pages):
-                    try:
-                        # get tables in the current page
-                        tables = page.find_tables(table_settings=self._get_table_settings(page))
-                        
-                        # Extract and process tables first
-                        for table_num, _ in enumerate(tables):
-                            # Skip if this table has already been processed
-                            if (pagenum, table_num) in self.processed_tables:
-                                text_from_tables.append("")
-                                continue
-                            
-                            curr_table = self._extract_table(pagenum, table_num)
-                            
-                            if curr_table:
-                                table_string = self._table_converter(curr_table)
-                                text_from_tables.append(table_string)
-                            else:
-                                text_from_tables.append("")
-                        
-                        # Get all table bounding boxes
-                        bboxes = [table.bbox for table in tables]
-
-                        # Sort tables by vertical position (top to bottom)
-                        tables_with_pos = [(table.bbox[1], table) for table in tables]
-                        tables_with_pos.sort(reverse=True)
-
-                        # Get all text elements (words) with their positions
-                        words = page.extract_words()
-                        
-                        # Add table positions to the sequence
-                        elements = []
-                        for word in words:
-                            v_mid = (word["top"] + word["bottom"]) / 2
-                            h_mid = (word["x0"] + word["x1"]) / 2
-                            # Check if the word is within the table boundaries
-                            in_any_table = False
-                            for bbox in bboxes:
-                                x0, top, x1, bottom = bbox
-                                if (h_mid >= x0 and h_mid < x1 and v_mid >= top and v_mid < bottom):
-                                    in_any_table = True
-                                    break
-                            # If the word is not within any table, add it to the elements
-                            if not in_any_table:
-                                elements.append({
-                                    "top": word["top"],
-                                    "content": word["text"] + " "
-                                })
-                        
-                        # Add table markers
-                        for _, table in tables_with_pos:
-                            elements.append({
-                                "top": table.bbox[1],
-                                "content": "\n[[TABLE]]\n"
-                            })
-                        
-                        # Sort all elements by vertical position (top to bottom)
-                        elements.sort(key=lambda x: x["top"])
-                        # Combine all content
-                        pure_texts.append("".join(element["content"] for element in elements))
-                    except Exception as e:
-                        print(f"Error processing page {pagenum}: {str(e)}")
-                        pure_texts.append("")
-                        text_from_tables.append("")
+            # get tables in the current page
+            tables = page.find_tables(table_settings=self._get_table_settings(page))
+        except Exception as e:
+            print(f"Error processing page {pagenum}: {str(e)}")
+            return None, None
+
+        try:
+            # Get all text elements (words) with their positions
+            words = page.extract_words()
+            return len(tables), self._text_with_table_markers(words, [table.bbox for table in tables])
+        except Exception as e:
+            print(f"Error processing page {pagenum}: {str(e)}")
+            return len(tables), None
+
+    def _page_text(self, pagenum, table_count, text):
+        """Text of a page with the text of its tables in place of their markers."""
+        if table_count is None:
+            return ""
+
+        table_texts = []
+        try:
+            for table_num in range(table_count):
+                # Skip if this table has already been processed
+                if (pagenum, table_num) in self.processed_tables:
+                    table_texts.append("")
+                    continue
                 
-                # Ensure we have matching lengths
-                while len(pure_texts) > len(text_from_tables):
-                    text_from_tables.append("")
-                while len(text_from_tables) > len(pure_texts):
-                    pure_texts.append("")
+                curr_table = self._extract_table(pagenum, table_num)
                 
-                table_iter = iter(text_from_tables)
+                if curr_table:
+                    table_texts.append(self._table_converter(curr_table))
+                else:
+                    table_texts.append("")
+        except Exception as e:
+            print(f"Error processing page {pagenum}: {str(e)}")
+            return ""
+
+        if text is None:
+            return ""
+        
+        table_iter = iter(table_texts)
+
+        # Replace each [[TABLE]] in the page using regex and the next table of the page
+        def replace_table(match):
+            try:
+                return next(table_iter)
+            except StopIteration:
+                return ""
 
-                # Replace each [[TABLE]] in each string using regex and the next table name
-                def replace_table(match):
+        return re.sub(r'\[\[TABLE\]\]', replace_table, text)
+
+    def _submit_range(self):
+        """Hand the next range of PAGES_PER_RANGE pages to a worker process."""
+        start = self.next_range_start
+        if start >= self.page_count:
+            return
+        end = min(start + PAGES_PER_RANGE, self.page_count)
+        future = self.executor.submit(extract_page_range, self.file_path, start, end, self.fast_text_pages)
+        self.pending_ranges.append((start, end, future))
+        self.next_range_start = end
+
+    def _load_pages(self, page_num):
+        """
+        Load what is known about the pages up to page_num before they are read: the layouts and tables
+        returned by the worker processes when extracting in parallel, otherwise which pages have no lines
+        and their text. Pages are loaded a range at a time, a page's tables can be looked up ahead of it
+        by a table continuing onto it.
+        """
+        while self.loaded_until <= page_num and self.loaded_until < self.page_count:
+            if self.executor is None:
+                start, end = self.loaded_until, min(self.loaded_until + PAGES_PER_RANGE, self.page_count)
+                for pagenum, text in self._read_text_only_pages(start, end).items():
+                    self.layouts[pagenum] = (0, text)
+                    # without lines there are no tables to look up
+                    self.tables_per_page[pagenum] = []
+            else:
+                start, end, future = self.pending_ranges.popleft()
+                for pagenum, (table_count, text, tables) in enumerate(future.result(), start):
+                    self.layouts[pagenum] = (table_count, text)
+                    if tables is not None:
+                        self.tables_per_page[pagenum] = tables
+                self._submit_range()
+            self.loaded_until = end
+
+    def iter_pages(self, executor=None):
+        """
+        Extract the PDF page by page, yielding (page number, text) with page numbers starting at 1.
+        A table continuing over several pages is part of the text of the page it starts on.
+        Only the pages ahead of the current one that are already loaded are kept in memory, so a large PDF
+        never has to be held as one string.
+        Given a process pool executor, the PDF is extracted by its workers in ranges of PAGES_PER_RANGE
+        pages, at most RANGES_IN_FLIGHT ahead of the page being yielded, a smaller PDF as a single range.
+        Tables continuing from one range into the next are stitched here, so the text is the same as when
+        the pages are processed one by one.
+        Errors reading a single page are handled where the page is read. Any other error is raised, so a PDF
+        that was only read in part is reported as failed instead of being indexed without its remaining pages.
+        """
+        try:
+            with pdfplumber.open(self.file_path) as pdf:
+                self.pdf = pdf
+                self.page_count = len(pdf.pages)
+                self.tables_per_page = {}
+                self.layouts = {}
+                self.loaded_until = 0
+                self.executor = executor
+                self.pending_ranges = deque()
+                self.next_range_start = 0
+                if self.executor is not None:
+                    for _ in range(RANGES_IN_FLIGHT):
+                        self._submit_range()
+
+                for pagenum, page in enumerate(pdf.pages):
                     try:
-                        return next(table_iter)
-                    except StopIteration:
-                        return ""
+                        self._load_pages(pagenum)
+                        if pagenum in self.layouts:
+                            table_count, text = self.layouts.pop(pagenum)
+                        else:
+                            table_count, text = self._page_layout(pagenum, page)
+                        page_text = self._page_text(pagenum, table_count, text)
+                    finally:
+                        # Continuations only look ahead, so this page's tables and parsed objects are not needed again
+                        self.tables_per_page.pop(pagenum, None)
+                        page.close()
+                    yield pagenum + 1, page_text
+        finally:
+            for _, _, future in self.pending_ranges:
+                future.cancel()
+            self.pending_ranges.clear()
 
-                combined_result = [re.sub(r'\[\[TABLE\]\]', replace_table, s) for s in pure_texts]
-                return " ".join(combined_result)
-        except Exception as e:
-            print(f"Error processing PDF file: {str(e)}")
-            return ""
+    def process_file(self, executor=None):
+        """Process PDF and extract text and tables, the text of all pages in one string, see iter_pages."""
+        return " ".join(page_text for _, page_text in self.iter_pages(executor))
+
+
+def extract_page_range(file_path, start, end, fast_text_pages=True):
+    """
+    Layout and tables of pages start to end - 1 of a PDF, run in a worker process by a parallel iter_pages.
+    Returns (number of tables, text, tables) for each page, tables is the error message when extracting
+    them failed and None when no table of the page can be looked up: it has none and does not follow a page with tables.
+    """
+    processor = PDFProcessor(file_path, fast_text_pages)
+    text_only_pages = processor._read_text_only_pages(start, end)
+    results = []
+    with pdfplumber.open(file_path) as pdf:
+        previous_tables = None
+        for pagenum in range(start, end):
+            if pagenum in text_only_pages:
+                results.append((0, text_only_pages[pagenum], []))
+                previous_tables = []
+                continue
+            page = pdf.pages[pagenum]
+            try:
+                table_count, text = processor._page_layout(pagenum, page)
+                tables = None
+                # The first page of a range may continue a table of the previous range
+                if table_count or previous_tables or (pagenum == start and pagenum > 0):
+                    try:
+                        tables = page.extract_tables()
+                    except Exception as e:
+                        tables = str(e)
+                results.append((table_count, text, tables))
+                previous_tables = tables
+            finally:
+                page.close()
+    return results
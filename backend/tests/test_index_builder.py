@@ -0,0 +1,84 @@
+"""
+Chat retrieval uses MMR, which reconstructs the vectors of the search hits, so every index type
+has to support it once published and opened from the disk cache.
+
+Run from the backend directory: python -m pytest tests
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import faiss
+import numpy as np
+import utils.index_builder as index_builder
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.schema import Document
+from utils.index_disk_cache import INDEX_FILE, load_vector_store_mmap
+from utils.packed_docstore import PACKED_DOCSTORE_FILE, write_packed_docstore
+
+DIMENSION = 16
+# Enough vectors that the IVF types are trained instead of falling back to flat
+VECTOR_COUNT = index_builder.MIN_TRAINED_INDEX_VECTORS
+
+
+class FixedQueryEmbeddings:
+    def __init__(self, vector: np.ndarray):
+        self.vector = [float(value) for value in vector]
+
+    def embed_query(self, text: str) -> list:
+        return self.vector
+
+
+class MMRRetrievalTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.vectors = np.random.default_rng(0).normal(size=(VECTOR_COUNT, DIMENSION)).astype(np.float32)
+
+    def _publish_flat(self, index_dir: str) -> faiss.Index:
+        """Write a flat index.faiss and its chunks the way ingestion does before write_search_index"""
+        flat_index = faiss.IndexFlatL2(DIMENSION)
+        flat_index.add(self.vectors)
+        faiss.write_index(flat_index, os.path.join(index_dir, INDEX_FILE))
+        docstore = InMemoryDocstore({str(i): Document(page_content=f"chunk {i}") for i in range(VECTOR_COUNT)})
+        write_packed_docstore(
+            os.path.join(index_dir, PACKED_DOCSTORE_FILE),
+            docstore,
+            {i: str(i) for i in range(VECTOR_COUNT)}
+        )
+        return flat_index
+
+    def _mmr_search(self, index_dir: str) -> list:
+        vector_store = load_vector_store_mmap(index_dir, FixedQueryEmbeddings(self.vectors[0]))
+        retriever = vector_store.as_retriever(search_type="mmr", search_kwargs={"k": 3})
+        return retriever.get_relevant_documents("query")
+
+    def test_mmr_search_on_every_index_type(self):
+        for index_type in index_builder.INDEX_TYPES:
+            with self.subTest(index_type=index_type), tempfile.TemporaryDirectory() as index_dir:
+                flat_index = self._publish_flat(index_dir)
+                with mock.patch.object(index_builder, "INDEX_TYPE", index_type):
+                    params = index_builder.write_search_index(index_dir, flat_index)
+                self.assertEqual(params["type"], index_type)
+
+                documents = self._mmr_search(index_dir)
+                self.assertEqual(len(documents), 3)
+                # The query is vector 0, every index type finds it first
+                self.assertEqual(documents[0].page_content, "chunk 0")
+
+    def test_mmr_search_on_ivf_index_published_without_direct_map(self):
+        with tempfile.TemporaryDirectory() as index_dir:
+            self._publish_flat(index_dir)
+            params = index_builder.choose_index_params(VECTOR_COUNT, DIMENSION, "ivf_flat")
+            index = faiss.index_factory(DIMENSION, params["factory"])
+            index.train(self.vectors)
+            index.add(self.vectors)
+            faiss.write_index(index, os.path.join(index_dir, INDEX_FILE))
+
+            documents = self._mmr_search(index_dir)
+            self.assertEqual(documents[0].page_content, "chunk 0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from config import ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SIMILARITY_THRESHOLD, ANSWER_CACHE_TTL_SECONDS
+
+
+class AnswerCache:
+    """
+    Per-chatbot semantic cache of answers to history-free questions.
+    A question is answered from the cache when its embedding is close enough (cosine similarity)
+    to the embedding of a question answered before against the same index version.
+    """
+    _instance = None
+    _lock = threading.Lock() # use lock to avoid race condition
+
+    def __new__(cls): # singleton pattern
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialize()
+            return cls._instance
+
+    def _initialize(self):
+        """Initialize the singleton instance"""
+        self.max_entries = ANSWER_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ANSWER_CACHE_TTL_SECONDS
+        self.similarity_threshold = ANSWER_CACHE_SIMILARITY_THRESHOLD
+        # chatbot_id -> {'version': index version, 'entries': [{'embedding', 'answer', 'expires_at', 'last_used'}]}
+        self.chatbots: Dict[str, Dict[str, Any]] = {}
+        self.chatbots_lock = threading.Lock()
+
+    def lookup(self, chatbot_id: str, version: str, embedding: List[float]) -> Optional[str]:
+        """Return a cached answer for a question with this embedding, or None"""
+        query = self._normalize(embedding)
+        now = time.time()
+        with self.chatbots_lock:
+            entries = self._live_entries(chatbot_id, version, now)
+            if not entries:
+                return None
+
+            # Cosine similarity against every cached question in one matrix product
+            similarities = np.stack([entry['embedding'] for entry in entries]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                return None
+
+            entries[best]['last_used'] = now
+            logging.info(f"Answer cache hit for chatbot {chatbot_id} (similarity {similarities[best]:.3f})")
+            return entries[best]['answer']
+
+    def store(self, chatbot_id: str, version: str, embedding: List[float], answer: str) -> None:
+        """Cache the answer to a question, evicting the least recently used entry when full"""
+        now = time.time()
+        with self.chatbots_lock:
+            entries = self._live_entries(chatbot_id, version, now)
+            if len(entries) >= self.max_entries:
+                entries.remove(min(entries, key=lambda entry: entry['last_used']))
+            entries.append({
+                'embedding': self._normalize(embedding),
+                'answer': answer,
+                'expires_at': now + self.ttl_seconds,
+                'last_used': now,
+            })
+
+    def invalidate(self, chatbot_id: str) -> None:
+        """Drop every cached answer of a chatbot"""
+        with self.chatbots_lock:
+            self.chatbots.pop(chatbot_id, None)
+
+    def _live_entries(self, chatbot_id: str, version: str, now: float) -> List[Dict[str, Any]]:
+        """Unexpired entries for this index version, caller must hold chatbots_lock"""
+        cached = self.chatbots.get(chatbot_id)
+        # Answers computed against another index version are stale
+        if cached is None or cached['version'] != version:
+            cached = {'version': version, 'entries': []}
+            self.chatbots[chatbot_id] = cached
+        cached['entries'] = [entry for entry in cached['entries'] if entry['expires_at'] > now]
+        return cached['entries']
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
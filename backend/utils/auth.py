@@ -1,7 +1,8 @@
+import time
 from functools import wraps
 
 import jwt
-from config import SUPABASE_JWT_SECRET
+from config import JOB_USER_TOKEN_TTL_SECONDS, SUPABASE_JWT_SECRET
 from exceptions.unauthorized_exception import UnauthorizedException
 from flask import g, request
 
@@ -49,3 +50,23 @@ def require_auth(f):
         return f(*args, **kwargs)
 
     return decorated_function
+
+
+def create_user_token(user_id: str, expires_in: int = JOB_USER_TOKEN_TTL_SECONDS) -> str:
+    """
+    Short-lived access token for a user, signed like the tokens Supabase issues.
+    Background jobs run with it, so they keep the user's row level security without storing
+    the token of the request that queued them, which may have expired by the time the job runs.
+    """
+    now = int(time.time())
+    return jwt.encode(
+        {
+            "sub": user_id,
+            "role": "authenticated",
+            "aud": "authenticated",
+            "iat": now,
+            "exp": now + expires_in,
+        },
+        SUPABASE_JWT_SECRET,
+        algorithm="HS256",
+    )
@@ -0,0 +1,10 @@
+from utils.answer_cache import AnswerCache
+from utils.conversation_chain_factory import ConversationChainFactory
+from utils.vector_store_cache import VectorStoreCache
+
+
+def invalidate_chatbot_caches(chatbot_id: str) -> None:
+    """Drop everything this process has cached for a chatbot's index, call it whenever the index changes"""
+    VectorStoreCache().invalidate(chatbot_id)
+    ConversationChainFactory().invalidate(chatbot_id)
+    AnswerCache().invalidate(chatbot_id)
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from config import EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_SQLITE_PATH
+from langchain.embeddings.base import Embeddings
+
+
+class EmbeddingCache:
+    """
+    Process-wide store of embedding vectors keyed by model name and normalized text hash.
+    An in-memory LRU tier sits in front of an optional SQLite tier (EMBEDDING_CACHE_SQLITE_PATH),
+    which survives restarts and can be shared by the worker processes of a host.
+    """
+    _instance = None
+    _lock = threading.Lock() # use lock to avoid race condition
+
+    def __new__(cls): # singleton pattern
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialize()
+            return cls._instance
+
+    def _initialize(self):
+        """Initialize the singleton instance"""
+        self.max_entries = EMBEDDING_CACHE_MAX_ENTRIES
+        self.memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.memory_lock = threading.Lock()
+        self.db = None
+        if EMBEDDING_CACHE_SQLITE_PATH:
+            self.db = sqlite3.connect(EMBEDDING_CACHE_SQLITE_PATH, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")  # lets several processes read while one writes
+            self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self.db.commit()
+            self.db_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Cache key of a text, whitespace differences do not change the key"""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors of the given keys, missing keys are left out"""
+        found: Dict[str, np.ndarray] = {}
+        with self.memory_lock:
+            for key in keys:
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    found[key] = vector
+
+        missing = [key for key in keys if key not in found]
+        if self.db is not None and missing:
+            with self.db_lock:
+                rows = []
+                # stay below SQLite's limit on query parameters
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows += self.db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+            from_db = {key: np.frombuffer(vector, dtype=np.float32) for key, vector in rows}
+            self._remember(from_db)
+            found.update(from_db)
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        """Cache vectors in every tier"""
+        self._remember(vectors)
+        if self.db is not None and vectors:
+            with self.db_lock:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.astype(np.float32).tobytes()) for key, vector in vectors.items()]
+                )
+                self.db.commit()
+
+    def _remember(self, vectors: Dict[str, np.ndarray]) -> None:
+        """Add vectors to the in-memory tier, evicting the least recently used ones"""
+        with self.memory_lock:
+            for key, vector in vectors.items():
+                self.memory[key] = vector
+                self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends texts to the underlying model when they are not in the EmbeddingCache"""
+
+    def __init__(self, underlying: Embeddings, model: Optional[str] = None):
+        self.underlying = underlying
+        self.model = model or getattr(underlying, "model", underlying.__class__.__name__)
+        self.cache = EmbeddingCache()
+        self.cache_hits = 0  # texts served from the cache by this instance
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed each missing text once, even if it occurs several times in this call
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+            self.cache.put_many(computed)
+            found.update(computed)
+
+        self.cache_hits += len(texts) - len(missing)
+        logging.info(f"Embedded {len(texts)} texts, {len(texts) - len(missing)} served from the embedding cache")
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = EmbeddingCache.make_key(self.model, text)
+        found = self.cache.get_many([key])
+        if key in found:
+            self.cache_hits += 1
+            return found[key].tolist()
+        vector = np.asarray(self.underlying.embed_query(text), dtype=np.float32)
+        self.cache.put_many({key: vector})
+        return vector.tolist()
@@ -0,0 +1,148 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from config import CHAT_WRITE_BEHIND_BATCH_SIZE, CHAT_WRITE_BEHIND_INTERVAL, CHAT_WRITE_BEHIND_MAX_RETRIES
+
+
+class ChatMessageWriter:
+    """
+    Write-behind buffer for rows of the chats table.
+    Messages are queued in memory and flushed as multi-row inserts every CHAT_WRITE_BEHIND_INTERVAL seconds,
+    as soon as CHAT_WRITE_BEHIND_BATCH_SIZE messages are pending, and once more when the process exits.
+    A rejected insert is retried row by row, so one bad row (e.g. of a deleted session) does not take the
+    other messages down with it, and failed rows wait an exponential backoff before their next attempt.
+    """
+    _instance = None
+    _lock = threading.Lock() # use lock to avoid race condition
+
+    def __new__(cls): # singleton pattern
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialize()
+            return cls._instance
+
+    def _initialize(self):
+        """Initialize the singleton instance and start the flusher thread"""
+        self.batch_size = CHAT_WRITE_BEHIND_BATCH_SIZE
+        self.interval = CHAT_WRITE_BEHIND_INTERVAL
+        self.max_retries = CHAT_WRITE_BEHIND_MAX_RETRIES
+        # Each entry: {'supabase': client to insert with, 'row': chats row, 'attempts': failed inserts so far,
+        # 'retry_at': time.monotonic() before which it is not tried again}
+        self.pending: List[Dict[str, Any]] = []
+        # Last created_at handed out per session, used to keep timestamps strictly increasing
+        self.last_created_at: Dict[str, datetime] = {}
+        self.pending_lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # only one flush at a time, so batches go out in order
+        self.wake_up = threading.Event()
+
+        thread = threading.Thread(target=self._run, name="chat-message-writer")
+        thread.daemon = True # Thread will be terminated when the main thread terminates
+        thread.start()
+        # Last chance for the queued messages, rows waiting for a retry are tried right away
+        atexit.register(self.flush, True)
+
+    def enqueue(self, supabase: Any, row: Dict[str, Any]) -> None:
+        """
+        Queue a chats row for insertion.
+        The row gets an explicit created_at so that messages of a session keep their order
+        even when several of them end up in the same multi-row insert.
+        """
+        with self.pending_lock:
+            session_id = row['session_id']
+            created_at = datetime.now(timezone.utc)
+            last = self.last_created_at.get(session_id)
+            if last is not None and created_at <= last:
+                created_at = last + timedelta(microseconds=1)
+            self.last_created_at[session_id] = created_at
+
+            self.pending.append({
+                'supabase': supabase,
+                'row': {**row, 'created_at': created_at.isoformat()},
+                'attempts': 0,
+                'retry_at': 0.0,
+            })
+            if len(self.pending) >= self.batch_size:
+                self.wake_up.set()
+
+    def pending_messages(self, chatbot_id: str, session_id: str) -> List[Dict[str, Any]]:
+        """Rows of a session that are queued but not yet written, oldest first"""
+        with self.pending_lock:
+            return [
+                entry['row'] for entry in self.pending
+                if entry['row']['chatbot_id'] == chatbot_id and entry['row']['session_id'] == session_id
+            ]
+
+    def flush(self, retry_now: bool = False) -> None:
+        """
+        Write the pending messages, one multi-row insert per consecutive run of rows sharing a client.
+        Args:
+            retry_now: also write the rows still waiting for their retry backoff
+        """
+        with self.flush_lock:
+            now = time.monotonic()
+            with self.pending_lock:
+                batch = [entry for entry in self.pending if retry_now or entry['retry_at'] <= now]
+                waiting = [entry for entry in self.pending if not (retry_now or entry['retry_at'] <= now)]
+                self.pending = waiting
+                # Sessions without queued rows no longer need their last timestamp
+                queued_sessions = {entry['row']['session_id'] for entry in batch + waiting}
+                self.last_created_at = {
+                    session_id: created_at for session_id, created_at in self.last_created_at.items()
+                    if session_id in queued_sessions
+                }
+            if not batch:
+                return
+
+            failed = []
+            start = 0
+            while start < len(batch):
+                supabase = batch[start]['supabase']
+                end = start
+                while end < len(batch) and batch[end]['supabase'] is supabase:
+                    end += 1
+                group = batch[start:end]
+                try:
+                    supabase.table('chats').insert([entry['row'] for entry in group]).execute()
+                    logging.info(f"Flushed {len(group)} chat messages")
+                except Exception as e:
+                    logging.error(f"Error flushing {len(group)} chat messages: {str(e)}")
+                    if len(group) == 1:
+                        failed += self._record_failure(group[0])
+                    else:
+                        # Find the rejected rows, the others of the group are written now
+                        for entry in group:
+                            try:
+                                supabase.table('chats').insert(entry['row']).execute()
+                            except Exception as row_error:
+                                logging.error(f"Error flushing chat message {entry['row']['id']}: {str(row_error)}")
+                                failed += self._record_failure(entry)
+                start = end
+
+            if failed:
+                # Put failed rows back in front of anything queued meanwhile to keep the order
+                with self.pending_lock:
+                    self.pending = failed + self.pending
+
+    def _record_failure(self, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Count a failed insert of a row, returns the row to queue again or nothing when it is dropped"""
+        entry['attempts'] += 1
+        if entry['attempts'] >= self.max_retries:
+            logging.error(f"Dropping chat message {entry['row']['id']} after {entry['attempts']} failed attempts")
+            return []
+        entry['retry_at'] = time.monotonic() + self.interval * 2 ** entry['attempts']
+        return [entry]
+
+    def _run(self):
+        """Flusher loop, wakes up on the interval or when a batch is full"""
+        while True:
+            self.wake_up.wait(self.interval)
+            self.wake_up.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error in chat message writer: {str(e)}")
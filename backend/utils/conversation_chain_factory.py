@@ -0,0 +1,115 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Tuple
+
+from config import CHAIN_CACHE_MAX_ENTRIES
+from langchain.chains import ConversationalRetrievalChain
+from langchain.chat_models import ChatOpenAI
+from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
+
+# Define your custom system template
+SYSTEM_TEMPLATE = """
+            You are a helpful AI assistant. Use the following pieces of context to answer the user's questions.
+            Always try to answer the question based on the context (the documents/vectors you have access to) and the current conversation.
+            If the context given is not relevant to the question, and the question is general, just answer it based on your knowledge.
+            If the context given is not relevant to the question, and the question is specific, just notify the user to be more specific.
+            You must reply in English all the time.
+            
+            When answering questions about tables, format the information clearly:
+            1. For simple lookups, present the specific cell values requested
+            2. For summarizing table data, organize information by rows or columns
+            3. When presenting tabular data, keep the original structure where appropriate
+            4. If the table has column headers, use them in your explanations
+            
+            Context: {context}
+            
+            Current conversation:
+            {chat_history}
+            """
+
+
+class ConversationChainFactory:
+    """
+    Builds one ConversationalRetrievalChain per chatbot index version and reuses it across requests.
+    Chains are created without memory, callers pass the session's chat history as the `chat_history` input.
+    """
+    _instance = None
+    _lock = threading.Lock() # use lock to avoid race condition
+
+    def __new__(cls): # singleton pattern
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialize()
+            return cls._instance
+
+    def _initialize(self):
+        """Initialize the singleton instance, the prompt and LLM clients are shared by every chain"""
+        # Create prompt templates
+        system_message_prompt = SystemMessagePromptTemplate.from_template(SYSTEM_TEMPLATE)
+        human_template = "{question}"
+        human_message_prompt = HumanMessagePromptTemplate.from_template(human_template)
+
+        self.chat_prompt = ChatPromptTemplate.from_messages([
+            system_message_prompt,
+            human_message_prompt,
+        ])
+
+        # The answer LLM streams its tokens to any callbacks passed in at call time.
+        # The condense-question LLM does not stream, so its rewritten question never leaks into a token stream.
+        self.answer_llm = ChatOpenAI(temperature=0.7, model_name="gpt-4o-mini", streaming=True)
+        self.condense_question_llm = ChatOpenAI(temperature=0.7, model_name="gpt-4o-mini")
+
+        self.max_entries = CHAIN_CACHE_MAX_ENTRIES
+        # (chatbot_id, version) -> chain, least recently used first
+        self.chains: "OrderedDict[Tuple[str, str], ConversationalRetrievalChain]" = OrderedDict()
+        self.chains_lock = threading.Lock()
+
+    def get_chain(self, chatbot_id: str, version: str, vector_store: Any) -> ConversationalRetrievalChain:
+        """Return the chain for this chatbot index version, building it on first use"""
+        key = (chatbot_id, version)
+        with self.chains_lock:
+            chain = self.chains.get(key)
+            # Rebuild if the vector store was reloaded (e.g. evicted from the vector store cache meanwhile)
+            if chain is not None and chain.retriever.vectorstore is vector_store:
+                self.chains.move_to_end(key)
+                return chain
+
+        chain = self._build_chain(vector_store)
+
+        with self.chains_lock:
+            self._remove_chatbot(chatbot_id)
+            self.chains[key] = chain
+            while len(self.chains) > self.max_entries:
+                self.chains.popitem(last=False)
+        return chain
+
+    def invalidate(self, chatbot_id: str) -> None:
+        """Drop the cached chains of a chatbot"""
+        with self.chains_lock:
+            self._remove_chatbot(chatbot_id)
+
+    def _remove_chatbot(self, chatbot_id: str) -> None:
+        """Remove all chains of a chatbot, caller must hold chains_lock"""
+        for key in [key for key in self.chains if key[0] == chatbot_id]:
+            del self.chains[key]
+
+    def _build_chain(self, vector_store: Any) -> ConversationalRetrievalChain:
+        # Configure advanced retrieval parameters to improve table retrieval
+        retriever = vector_store.as_retriever(
+            search_type="mmr",
+            search_kwargs={
+                "k": 3,
+            }
+        )
+
+        chain = ConversationalRetrievalChain.from_llm(
+            llm=self.answer_llm,
+            condense_question_llm=self.condense_question_llm,
+            retriever=retriever,
+            combine_docs_chain_kwargs={"prompt": self.chat_prompt},
+            verbose=True
+        )
+        logging.info("Conversation chain initialization completed")
+        return chain
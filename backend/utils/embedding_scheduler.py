@@ -0,0 +1,164 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional, TypeVar
+
+from config import (
+    EMBEDDING_BATCH_MAX_TEXTS,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_TOKENS_PER_MINUTE,
+)
+import openai
+from langchain.embeddings.base import Embeddings
+
+T = TypeVar("T")
+
+# Upper bound (in seconds) of a single backoff sleep
+MAX_BACKOFF_SECONDS = 60.0
+
+# Transient failures of an embedding request, other errors (invalid input, authentication) would fail again
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.TryAgain,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed embedding request is worth sending again: rate limits, timeouts, connection and server errors"""
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    status = getattr(error, "http_status", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, English text averages about four characters per token"""
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """Token bucket refilled continuously at `per_minute` units per minute, holding at most ten seconds' worth"""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * 10)
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float) -> None:
+        """Block until `amount` units are available and take them"""
+        # A request bigger than the bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+
+
+# Shared by all schedulers of the process, the API quota belongs to the API key and not to one ingestion
+_request_limiter = RateLimiter(EMBEDDING_REQUESTS_PER_MINUTE)
+_token_limiter = RateLimiter(EMBEDDING_TOKENS_PER_MINUTE)
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Embeddings wrapper that splits texts into batches by token count and embeds several batches at once,
+    staying under the process-wide request and token rate limits and retrying failed batches with jittered backoff.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        max_batch_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+        max_batch_texts: int = EMBEDDING_BATCH_MAX_TEXTS,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+    ):
+        self.underlying = underlying
+        # Same cache keys as the wrapped model, see CachedEmbeddings
+        self.model = getattr(underlying, "model", underlying.__class__.__name__)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_texts = max_batch_texts
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+    def _batches(self, texts: List[str]) -> List[List[int]]:
+        """Indices of the texts grouped into batches below the token and text limits"""
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        batch_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_texts):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _with_retries(self, call: Callable[[], T], tokens: int) -> T:
+        """Run one API request under the rate limits, retrying transient errors with full-jitter exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            _request_limiter.acquire(1)
+            _token_limiter.acquire(tokens)
+            try:
+                return call()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                backoff = random.uniform(0, min(MAX_BACKOFF_SECONDS, 2 ** attempt))
+                logging.warning(f"Embedding request failed ({str(e)}), retrying in {backoff:.1f}s")
+                time.sleep(backoff)
+
+    def embed_batches(self, texts: List[str]) -> Iterator[tuple[List[int], List[List[float]]]]:
+        """Yield (indices of the texts, their vectors) for each batch as soon as it completes"""
+        batches = self._batches(texts)
+        if not batches:
+            return
+        logging.info(f"Embedding {len(texts)} texts in {len(batches)} batches")
+        if len(batches) == 1:
+            yield batches[0], self._embed_batch(texts, batches[0])
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches)))
+        try:
+            futures = {executor.submit(self._embed_batch, texts, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # After a failed batch the queued ones are not worth sending
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _embed_batch(self, texts: List[str], batch: List[int]) -> List[List[float]]:
+        batch_texts = [texts[i] for i in batch]
+        tokens = sum(estimate_tokens(text) for text in batch_texts)
+        return self._with_retries(lambda: self.underlying.embed_documents(batch_texts), tokens)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, batch_vectors in self.embed_batches(texts):
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._with_retries(lambda: self.underlying.embed_query(text), estimate_tokens(text))
@@ -0,0 +1,135 @@
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+from config import INDEX_FLAT_MAX_VECTORS, INDEX_IVF_FLAT_MAX_VECTORS, INDEX_IVF_SQ8_MAX_VECTORS, INDEX_TYPE
+
+# Written next to index.faiss, records which index structure was built and its search parameters
+INDEX_PARAMS_FILE = "index.json"
+# Exact flat copy of the vectors, kept next to an approximate index so ingestion can still update it exactly
+SOURCE_INDEX_FILE = "source.faiss"
+
+INDEX_TYPES = ["flat", "ivf_flat", "hnsw", "ivf_sq8", "ivf_fp16", "ivf_pq"]
+
+# k-means wants at least this many training points per IVF list
+TRAINING_POINTS_PER_LIST = 39
+MAX_TRAINING_POINTS_PER_LIST = 256
+# Smallest index worth training, PQ needs 256 centroids per sub-quantizer
+MIN_TRAINED_INDEX_VECTORS = 256 * TRAINING_POINTS_PER_LIST
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    """Number of PQ sub-vectors, about 8 dimensions each (one byte per 8 floats), must divide the dimension"""
+    m = max(1, dimension // 8)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def choose_index_params(n_vectors: int, dimension: int, index_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Pick the index structure for a corpus, flat (exact) for small chatbots and IVF variants as they grow.
+    Args:
+        n_vectors: number of chunks in the index
+        dimension: embedding dimension
+        index_type: one of INDEX_TYPES, defaults to INDEX_TYPE; "auto" chooses by n_vectors
+    """
+    index_type = index_type or INDEX_TYPE
+    if index_type == "auto":
+        if n_vectors < INDEX_FLAT_MAX_VECTORS:
+            index_type = "flat"
+        elif n_vectors < INDEX_IVF_FLAT_MAX_VECTORS:
+            index_type = "ivf_flat"
+        elif n_vectors < INDEX_IVF_SQ8_MAX_VECTORS:
+            index_type = "ivf_sq8"
+        else:
+            index_type = "ivf_pq"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}")
+    if index_type.startswith("ivf") and n_vectors < MIN_TRAINED_INDEX_VECTORS:
+        # Too few vectors to train the quantizers on, and flat search is fast at this size anyway
+        index_type = "flat"
+
+    params: Dict[str, Any] = {"type": index_type, "dimension": dimension, "ntotal": n_vectors}
+    if index_type == "flat":
+        params["factory"] = "Flat"
+    elif index_type == "hnsw":
+        params.update(factory="HNSW32", ef_construction=80, ef_search=64)
+    else:
+        # About 4 * sqrt(n) lists rounded to a power of two, with enough vectors per list to train on
+        nlist = 2 ** round(math.log2(max(1.0, 4 * math.sqrt(n_vectors))))
+        nlist = max(1, min(nlist, n_vectors // TRAINING_POINTS_PER_LIST))
+        codes = {
+            "ivf_flat": "Flat",
+            "ivf_sq8": "SQ8",
+            "ivf_fp16": "SQfp16",
+            "ivf_pq": f"PQ{_pq_subquantizers(dimension)}x8",
+        }[index_type]
+        params.update(factory=f"IVF{nlist},{codes}", nlist=nlist, nprobe=min(nlist, max(8, nlist // 16)))
+    return params
+
+
+def apply_search_params(index: Any, params: Dict[str, Any]) -> None:
+    """Set the query-time parameters recorded for an index"""
+    parameter_space = faiss.ParameterSpace()
+    if "nprobe" in params:
+        parameter_space.set_index_parameter(index, "nprobe", params["nprobe"])
+    if "ef_search" in params:
+        parameter_space.set_index_parameter(index, "efSearch", params["ef_search"])
+
+
+def build_search_index(vectors: np.ndarray, params: Dict[str, Any]) -> Any:
+    """Build the index described by params over the vectors, keeping their order so docstore positions still match"""
+    index = faiss.index_factory(params["dimension"], params["factory"])
+    if "ef_construction" in params:
+        index.hnsw.efConstruction = params["ef_construction"]
+    if not index.is_trained:
+        # Training on a sample is as good as on everything and much faster for large corpora
+        sample_size = min(len(vectors), params.get("nlist", 1) * MAX_TRAINING_POINTS_PER_LIST)
+        sample = vectors
+        if sample_size < len(vectors):
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    add_direct_map(index)
+    apply_search_params(index, params)
+    return index
+
+
+def add_direct_map(index: Any) -> None:
+    """
+    Let an IVF index reconstruct vectors by id, which MMR retrieval does for every search.
+    Flat and HNSW indexes can always reconstruct, the map is saved with the index.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+def write_search_index(index_dir: str, flat_index: Any) -> Dict[str, Any]:
+    """
+    Replace the flat index.faiss in index_dir by the index structure chosen for its size, and record the choice.
+    The flat index is kept as source.faiss whenever the search index is approximate.
+    """
+    params = choose_index_params(flat_index.ntotal, flat_index.d)
+    if params["type"] != "flat":
+        os.replace(os.path.join(index_dir, "index.faiss"), os.path.join(index_dir, SOURCE_INDEX_FILE))
+        vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+        faiss.write_index(build_search_index(vectors, params), os.path.join(index_dir, "index.faiss"))
+        logging.info(f"Built {params['factory']} index over {flat_index.ntotal} vectors")
+    with open(os.path.join(index_dir, INDEX_PARAMS_FILE), "w") as f:
+        json.dump(params, f)
+    return params
+
+
+def read_index_params(index_dir: str) -> Dict[str, Any]:
+    """Recorded parameters of an index, indexes published before they were recorded are flat"""
+    path = os.path.join(index_dir, INDEX_PARAMS_FILE)
+    if not os.path.exists(path):
+        return {"type": "flat", "factory": "Flat"}
+    with open(path) as f:
+        return json.load(f)
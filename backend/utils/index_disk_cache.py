@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from typing import Callable, List
+
+import faiss
+from config import INDEX_DISK_CACHE_DIR, INDEX_DISK_CACHE_MAX_BYTES
+from langchain.embeddings.base import Embeddings
+from langchain.vectorstores import FAISS
+from utils.index_builder import INDEX_PARAMS_FILE, add_direct_map, apply_search_params, read_index_params
+from utils.packed_docstore import PACKED_DOCSTORE_FILE, PackedDocstore, PackedPositions, read_packed_docstore
+
+INDEX_FILE = "index.faiss"
+# Pickled (docstore, index_to_docstore_id), written by FAISS.save_local before the packed format was used
+LEGACY_DOCSTORE_FILE = "index.pkl"
+# An index version holds one of these chunk stores, newest format first
+DOCSTORE_FILES = [PACKED_DOCSTORE_FILE, LEGACY_DOCSTORE_FILE]
+# Files that indexes published before they existed do not have
+OPTIONAL_INDEX_FILES = [INDEX_PARAMS_FILE]
+
+
+def is_not_found_error(error: Exception) -> bool:
+    """Whether a storage download failed because the file does not exist, not because of a transient error"""
+    status = getattr(error, "status", None)
+    if status is not None:
+        # StorageApiError of the storage client, missing objects are reported as 404 or with a not_found code
+        return str(status) == "404" or getattr(error, "code", None) == "not_found"
+    return "not found" in str(error).lower()
+
+
+class IndexDiskCache:
+    """
+    Host-wide, content-addressed cache of downloaded vector index files.
+    Every published index version gets its own read-only directory, so worker processes on the
+    same host download an index once and then share the files (and the OS page cache) for it.
+    """
+    _instance = None
+    _lock = threading.Lock() # use lock to avoid race condition
+
+    def __new__(cls): # singleton pattern
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialize()
+            return cls._instance
+
+    def _initialize(self):
+        """Initialize the singleton instance"""
+        self.cache_dir = INDEX_DISK_CACHE_DIR
+        self.max_bytes = INDEX_DISK_CACHE_MAX_BYTES
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, storage_path: str, version: str) -> str:
+        """Directory of an index version, addressed by the hash of its storage path and version"""
+        key = hashlib.sha256(f"{storage_path}@{version}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def get_index_dir(self, storage_path: str, version: str, download: Callable[[str], bytes]) -> str:
+        """
+        Return a local directory holding index.faiss and the chunk store for this index version,
+        downloading the files only if no process on this host has done so yet.
+        Args:
+            storage_path: Storage folder of the index, e.g. "<user_id>/<chatbot_id>/rag-vector"
+            version: Version of the published index
+            download: Function that downloads a file name inside storage_path and returns its bytes
+        """
+        entry_dir = self._entry_dir(storage_path, version)
+        if os.path.isdir(entry_dir):
+            # Touch the entry so pruning keeps recently used indexes
+            os.utime(entry_dir)
+            logging.info(f"Index {storage_path} (version {version}) found in disk cache")
+            return entry_dir
+
+        # Download into a private directory first, then publish it with a single atomic rename
+        staging_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".staging-")
+        try:
+            with open(os.path.join(staging_dir, INDEX_FILE), 'wb') as f:
+                f.write(download(f"{storage_path}/{INDEX_FILE}"))
+            for file_name in DOCSTORE_FILES:
+                try:
+                    content = download(f"{storage_path}/{file_name}")
+                except Exception as e:
+                    if file_name == DOCSTORE_FILES[-1] or not is_not_found_error(e):
+                        raise
+                    # Published in an older format, try the next one
+                    continue
+                with open(os.path.join(staging_dir, file_name), 'wb') as f:
+                    f.write(content)
+                break
+            for file_name in OPTIONAL_INDEX_FILES:
+                try:
+                    content = download(f"{storage_path}/{file_name}")
+                except Exception as e:
+                    # Any other error discards the download, caching the version without the file would be permanent
+                    if not is_not_found_error(e):
+                        raise
+                    # Not published with this version
+                    continue
+                with open(os.path.join(staging_dir, file_name), 'wb') as f:
+                    f.write(content)
+            try:
+                os.rename(staging_dir, entry_dir)
+                logging.info(f"Index {storage_path} (version {version}) stored in disk cache")
+            except OSError:
+                # Another process published the same version first, use theirs
+                shutil.rmtree(staging_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        self._prune(keep=entry_dir)
+        return entry_dir
+
+    def _prune(self, keep: str) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries: List[tuple] = []
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = index_size_bytes(path)
+            entries.append((os.path.getmtime(path), path, size))
+            total_bytes += size
+
+        entries.sort()  # oldest first
+        for _, path, size in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            # Processes that still have the files mapped keep reading them, unlinking is safe
+            shutil.rmtree(path, ignore_errors=True)
+            total_bytes -= size
+            logging.info(f"Pruned index {path} from disk cache")
+
+
+def index_size_bytes(index_dir: str) -> int:
+    """Total size of the index files in a directory"""
+    return sum(os.path.getsize(os.path.join(index_dir, file_name)) for file_name in os.listdir(index_dir))
+
+
+def load_vector_store_mmap(index_dir: str, embeddings: Embeddings) -> FAISS:
+    """
+    Same as FAISS.load_local, but opens the index memory-mapped and read-only.
+    IVF inverted lists are served straight from the mapped file; flat indexes are read from the
+    shared page cache instead of a private temp copy. The packed chunk store is mapped as well and only
+    the chunks a search returns are decoded, so loading does not depend on the number of chunks.
+    """
+    index = faiss.read_index(
+        os.path.join(index_dir, INDEX_FILE),
+        faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    )
+    # IVF indexes published without a direct map cannot serve MMR retrieval, the map is built in memory
+    add_direct_map(index)
+    # IVF and HNSW indexes are searched with the parameters chosen when they were built
+    apply_search_params(index, read_index_params(index_dir))
+    packed_path = os.path.join(index_dir, PACKED_DOCSTORE_FILE)
+    if os.path.exists(packed_path):
+        docstore = PackedDocstore(packed_path)
+        return FAISS(embeddings.embed_query, index, docstore, PackedPositions(len(docstore)))
+    with open(os.path.join(index_dir, LEGACY_DOCSTORE_FILE), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings.embed_query, index, docstore, index_to_docstore_id)
+
+
+def load_writable_docstore(index_dir: str) -> tuple:
+    """Chunks of a cached index as a private (docstore, index_to_docstore_id) pair that can be modified"""
+    packed_path = os.path.join(index_dir, PACKED_DOCSTORE_FILE)
+    if os.path.exists(packed_path):
+        return read_packed_docstore(packed_path)
+    with open(os.path.join(index_dir, LEGACY_DOCSTORE_FILE), "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,38 @@
+import re
+import time
+import uuid
+from typing import Any, Dict
+
+# Version folder names, "v<milliseconds since epoch>-<random suffix>", so sorting by name sorts by age
+VERSION_PATTERN = re.compile(r"^v(\d{13})-[0-9a-f]{8}$")
+
+
+def index_root(user_id: str, chatbot_id: str) -> str:
+    """Storage folder holding every published index version of a chatbot"""
+    return f"{user_id}/{chatbot_id}/rag-vector"
+
+
+def new_index_version() -> str:
+    return f"v{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+
+
+def is_index_version(name: str) -> bool:
+    return VERSION_PATTERN.match(name) is not None
+
+
+def version_timestamp(version: str) -> float:
+    """Creation time of a version in seconds since the epoch"""
+    return int(VERSION_PATTERN.match(version).group(1)) / 1000
+
+
+def index_location(faiss_row: Dict[str, Any]) -> tuple[str, str]:
+    """
+    Storage folder and version of the index that a chatbot's faiss row in the documents table points to.
+    The faiss row is the "current version" pointer, publishing a new index switches its bucket_path.
+    """
+    folder = faiss_row['bucket_path'].rsplit('/', 1)[0]
+    version = folder.rsplit('/', 1)[1]
+    if not is_index_version(version):
+        # Index published before versioned folders, its row is replaced on every publish so the id is the version
+        return folder, faiss_row['id']
+    return folder, version
@@ -0,0 +1,160 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from config import (
+    JOB_MAX_ATTEMPTS,
+    JOB_QUEUE_MAX_PENDING,
+    JOB_QUEUE_MAX_PENDING_PER_TENANT,
+    JOB_QUEUE_POLL_INTERVAL,
+    JOB_QUEUE_TENANT_CONCURRENCY,
+    JOB_QUEUE_WORKERS,
+    JOB_RESULT_TTL_SECONDS,
+    JOB_STALE_SECONDS,
+)
+from exceptions.queue_full_exception import QueueFullException
+from utils.job_store import COMPLETED, FAILED, JobStore, create_job_store
+
+
+class JobQueue:
+    """
+    Durable queue of background jobs such as document ingestion, replacing one thread per request.
+    Jobs are kept in a shared JobStore, so any worker process can run a job and report its status,
+    and queued jobs survive a restart. Each process runs a fixed pool of JOB_QUEUE_WORKERS threads,
+    every user has at most JOB_QUEUE_TENANT_CONCURRENCY jobs running and jobs sharing a concurrency key
+    (one chatbot's ingestions) run one at a time.
+    """
+    _instance = None
+    _lock = threading.Lock() # use lock to avoid race condition
+
+    def __new__(cls): # singleton pattern
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialize()
+            return cls._instance
+
+    def _initialize(self):
+        """Initialize the singleton instance, the worker threads start with the first registered handler"""
+        self.store: JobStore = create_job_store()
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        # Jobs this process is running, their heartbeats tell other processes the workers are alive
+        self.running: Dict[str, str] = {}
+        self.running_lock = threading.Lock()
+        self.wake_up = threading.Event()
+        self.started = False
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]) -> None:
+        """
+        Run jobs of this kind with handler, called with the job's payload.
+        The handler's return value, which must be JSON serializable, becomes the job's result.
+        """
+        self.handlers[kind] = handler
+        with self._lock:
+            if not self.started:
+                self.started = True
+                self._start_threads()
+
+    def _start_threads(self) -> None:
+        for number in range(JOB_QUEUE_WORKERS):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}")
+            thread.daemon = True # Thread will be terminated when the main thread terminates
+            thread.start()
+        thread = threading.Thread(target=self._maintain, name="job-maintenance")
+        thread.daemon = True
+        thread.start()
+
+    def submit(self, kind: str, tenant_id: str, payload: Dict[str, Any], concurrency_key: Optional[str] = None) -> str:
+        """
+        Queue a job and return its id.
+        Raises QueueFullException when the queue, or this tenant's share of it, is full.
+        Args:
+            kind: registered job kind
+            tenant_id: user the job runs for, limits are applied per tenant
+            payload: JSON serializable arguments for the handler
+            concurrency_key: jobs with the same key never run at the same time
+        """
+        job_id = str(uuid.uuid4())
+        job = {
+            'id': job_id,
+            'tenant_id': tenant_id,
+            'concurrency_key': concurrency_key,
+            'kind': kind,
+            'payload': payload,
+        }
+        if not self.store.add(job, JOB_QUEUE_MAX_PENDING, JOB_QUEUE_MAX_PENDING_PER_TENANT):
+            raise QueueFullException("Too many jobs are waiting, try again later", data={"kind": kind})
+        logging.info(f"Queued {kind} job {job_id} for tenant {tenant_id}")
+        self.wake_up.set()
+        return job_id
+
+    def get_status(self, job_id: str, tenant_id: str) -> Dict[str, Any]:
+        """Status of one of a tenant's jobs, other tenants' jobs are reported as not found"""
+        job = self.store.get(job_id)
+        if job is None or job['tenant_id'] != tenant_id:
+            return {'status': 'not_found'}
+        status = {'status': job['status'], 'created_at': job['created_at']}
+        if job.get('started_at'):
+            status['started_at'] = job['started_at']
+        if job['status'] == COMPLETED:
+            status.update(result=job['result'], completed_at=job['finished_at'])
+        elif job['status'] == FAILED:
+            status.update(error=job['error'], completed_at=job['finished_at'])
+        return status
+
+    def _work(self) -> None:
+        """Worker thread: claim a job, run it, store the outcome"""
+        while True:
+            try:
+                job = self.store.claim(self.worker_id, JOB_QUEUE_TENANT_CONCURRENCY)
+            except Exception as e:
+                logging.error(f"Error claiming a job: {str(e)}")
+                job = None
+            if job is None:
+                # Sleep until a job is submitted in this process or the next poll for jobs submitted elsewhere
+                self.wake_up.wait(JOB_QUEUE_POLL_INTERVAL)
+                self.wake_up.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job['id']
+        with self.running_lock:
+            self.running[job_id] = job['kind']
+        try:
+            handler = self.handlers.get(job['kind'])
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind {job['kind']}")
+            result = handler(job['payload'])
+            self.store.finish(job_id, COMPLETED, result, None, JOB_RESULT_TTL_SECONDS)
+            logging.info(f"Job {job_id} completed")
+        except Exception as e:
+            logging.error(f"Error in job {job_id}: {str(e)}")
+            self.store.finish(job_id, FAILED, None, str(e), JOB_RESULT_TTL_SECONDS)
+        finally:
+            with self.running_lock:
+                self.running.pop(job_id, None)
+            # A finished job can unblock queued jobs of the same tenant or chatbot
+            self.wake_up.set()
+
+    def _maintain(self) -> None:
+        """Send heartbeats for running jobs, queue again jobs of dead workers and drop expired results"""
+        interval = max(1.0, JOB_STALE_SECONDS / 4)
+        while True:
+            try:
+                with self.running_lock:
+                    job_ids = list(self.running)
+                self.store.heartbeat(job_ids)
+                recovered = self.store.recover_stale(JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RESULT_TTL_SECONDS)
+                if recovered:
+                    logging.warning(f"Recovered {recovered} jobs of stopped workers")
+                    self.wake_up.set()
+                self.store.purge_expired()
+            except Exception as e:
+                logging.error(f"Error maintaining the job queue: {str(e)}")
+            time.sleep(interval)
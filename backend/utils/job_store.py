@@ -0,0 +1,342 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from config import JOB_QUEUE_SQLITE_PATH, JOB_STORE, SUPABASE_SECRET_KEY, SUPABASE_URL
+from supabase import create_client
+
+# Job statuses, queued -> running -> completed or failed
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Queued jobs looked at per claim, the oldest ones whose user and chatbot have room are taken first
+CLAIM_CANDIDATES = 50
+
+
+class JobStore(ABC):
+    """
+    Shared state of the ingestion job queue, every worker process reads and updates the same jobs.
+    A job is a dict with id, tenant_id, concurrency_key, kind, payload, status, attempts, result, error,
+    worker_id and created_at/started_at/finished_at timestamps.
+    """
+
+    @abstractmethod
+    def add(self, job: Dict[str, Any], max_pending: int, max_pending_per_tenant: int) -> bool:
+        """Queue a job, False when the queue or the tenant's share of it is full"""
+
+    @abstractmethod
+    def claim(self, worker_id: str, tenant_concurrency: int) -> Optional[Dict[str, Any]]:
+        """
+        Mark the oldest runnable queued job as running by this worker and return it.
+        A job is runnable while its tenant has fewer than tenant_concurrency running jobs
+        and no other job with its concurrency_key is running.
+        """
+
+    @abstractmethod
+    def heartbeat(self, job_ids: List[str]) -> None:
+        """Record that the worker running these jobs is alive"""
+
+    @abstractmethod
+    def finish(self, job_id: str, status: str, result: Any, error: Optional[str], ttl_seconds: int) -> None:
+        """Store the outcome of a job, it is kept for ttl_seconds"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job, None if it does not exist or its result expired"""
+
+    @abstractmethod
+    def recover_stale(self, stale_seconds: int, max_attempts: int, ttl_seconds: int) -> int:
+        """
+        Queue again the running jobs whose worker stopped sending heartbeats, returns how many.
+        Jobs that already ran max_attempts times fail instead, and are kept for ttl_seconds.
+        """
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Delete finished jobs past their expiry, returns how many"""
+
+
+def _runnable(candidates: List[Dict[str, Any]], running: List[Dict[str, Any]], tenant_concurrency: int) -> List[Dict[str, Any]]:
+    """Queued jobs that may start now given the running ones, oldest first"""
+    running_per_tenant: Dict[str, int] = {}
+    for job in running:
+        running_per_tenant[job['tenant_id']] = running_per_tenant.get(job['tenant_id'], 0) + 1
+    running_keys = {job['concurrency_key'] for job in running if job['concurrency_key']}
+    return [
+        job for job in candidates
+        if running_per_tenant.get(job['tenant_id'], 0) < tenant_concurrency
+        and not (job['concurrency_key'] and job['concurrency_key'] in running_keys)
+    ]
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Jobs in a SQLite file, shared by the worker processes of one host and kept across restarts.
+    Claims run in an immediate transaction, so two processes never take the same job.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_SQLITE_PATH):
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")  # lets several processes read while one writes
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                tenant_id TEXT NOT NULL,
+                concurrency_key TEXT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                worker_id TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                heartbeat_at REAL,
+                finished_at REAL,
+                expires_at REAL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self.db_lock = threading.Lock()
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        for column in ('created_at', 'started_at', 'finished_at'):
+            if job[column] is not None:
+                job[column] = datetime.utcfromtimestamp(job[column]).isoformat()
+        return job
+
+    def add(self, job: Dict[str, Any], max_pending: int, max_pending_per_tenant: int) -> bool:
+        with self.db_lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                pending, tenant_pending = self.db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(tenant_id = ?), 0) FROM jobs WHERE status IN (?, ?)",
+                    (job['tenant_id'], QUEUED, RUNNING)
+                ).fetchone()
+                if pending >= max_pending or tenant_pending >= max_pending_per_tenant:
+                    self.db.execute("ROLLBACK")
+                    return False
+                self.db.execute(
+                    "INSERT INTO jobs (id, tenant_id, concurrency_key, kind, payload, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job['id'], job['tenant_id'], job['concurrency_key'], job['kind'],
+                     json.dumps(job['payload']), QUEUED, time.time())
+                )
+                self.db.execute("COMMIT")
+                return True
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker_id: str, tenant_concurrency: int) -> Optional[Dict[str, Any]]:
+        with self.db_lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                candidates = self.db.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?", (QUEUED, CLAIM_CANDIDATES)
+                ).fetchall()
+                running = self.db.execute(
+                    "SELECT tenant_id, concurrency_key FROM jobs WHERE status = ?", (RUNNING,)
+                ).fetchall()
+                runnable = _runnable([dict(row) for row in candidates], [dict(row) for row in running], tenant_concurrency)
+                if not runnable:
+                    self.db.execute("COMMIT")
+                    return None
+                now = time.time()
+                self.db.execute(
+                    "UPDATE jobs SET status = ?, worker_id = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ? "
+                    "WHERE id = ?",
+                    (RUNNING, worker_id, now, now, runnable[0]['id'])
+                )
+                row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (runnable[0]['id'],)).fetchone()
+                self.db.execute("COMMIT")
+                return self._to_job(row)
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, job_ids: List[str]) -> None:
+        if not job_ids:
+            return
+        with self.db_lock:
+            self.db.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND id IN ({','.join('?' * len(job_ids))})",
+                [time.time(), RUNNING] + job_ids
+            )
+
+    def finish(self, job_id: str, status: str, result: Any, error: Optional[str], ttl_seconds: int) -> None:
+        now = time.time()
+        with self.db_lock:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, now + ttl_seconds, job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.db_lock:
+            row = self.db.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)", (job_id, time.time())
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def recover_stale(self, stale_seconds: int, max_attempts: int, ttl_seconds: int) -> int:
+        now = time.time()
+        with self.db_lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                cutoff = now - stale_seconds
+                failed = self.db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, expires_at = ? "
+                    "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                    (FAILED, "Worker stopped while running the job", now, now + ttl_seconds, RUNNING, cutoff, max_attempts)
+                ).rowcount
+                requeued = self.db.execute(
+                    "UPDATE jobs SET status = ?, worker_id = NULL WHERE status = ? AND heartbeat_at < ?",
+                    (QUEUED, RUNNING, cutoff)
+                ).rowcount
+                self.db.execute("COMMIT")
+                return failed + requeued
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def purge_expired(self) -> int:
+        with self.db_lock:
+            return self.db.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+class SupabaseJobStore(JobStore):
+    """
+    Jobs in the Supabase jobs table, shared by every worker process on every host.
+    Claims are conditional updates, a job already taken by another worker is skipped.
+    The limits are checked before writing, so concurrent submissions or claims can briefly exceed them by a few jobs.
+    """
+
+    def __init__(self):
+        # Workers handle every user's jobs, so they use the service key rather than a user's token
+        self.supabase = create_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.utcnow()
+
+    def add(self, job: Dict[str, Any], max_pending: int, max_pending_per_tenant: int) -> bool:
+        pending = self.supabase.table('jobs') \
+            .select('tenant_id') \
+            .in_('status', [QUEUED, RUNNING]) \
+            .execute().data
+        if len(pending) >= max_pending or sum(row['tenant_id'] == job['tenant_id'] for row in pending) >= max_pending_per_tenant:
+            return False
+        self.supabase.table('jobs').insert({
+            'id': job['id'],
+            'tenant_id': job['tenant_id'],
+            'concurrency_key': job['concurrency_key'],
+            'kind': job['kind'],
+            'payload': job['payload'],
+            'status': QUEUED,
+            'created_at': self._now().isoformat(),
+        }).execute()
+        return True
+
+    def claim(self, worker_id: str, tenant_concurrency: int) -> Optional[Dict[str, Any]]:
+        candidates = self.supabase.table('jobs') \
+            .select('*') \
+            .eq('status', QUEUED) \
+            .order('created_at') \
+            .limit(CLAIM_CANDIDATES) \
+            .execute().data
+        if not candidates:
+            return None
+        running = self.supabase.table('jobs') \
+            .select('tenant_id, concurrency_key') \
+            .eq('status', RUNNING) \
+            .execute().data
+        for job in _runnable(candidates, running, tenant_concurrency):
+            now = self._now().isoformat()
+            claimed = self.supabase.table('jobs') \
+                .update({
+                    'status': RUNNING,
+                    'worker_id': worker_id,
+                    'attempts': job['attempts'] + 1,
+                    'started_at': now,
+                    'heartbeat_at': now,
+                }) \
+                .eq('id', job['id']) \
+                .eq('status', QUEUED) \
+                .execute().data
+            if claimed:
+                return claimed[0]
+        return None
+
+    def heartbeat(self, job_ids: List[str]) -> None:
+        if job_ids:
+            self.supabase.table('jobs') \
+                .update({'heartbeat_at': self._now().isoformat()}) \
+                .in_('id', job_ids) \
+                .eq('status', RUNNING) \
+                .execute()
+
+    def finish(self, job_id: str, status: str, result: Any, error: Optional[str], ttl_seconds: int) -> None:
+        now = self._now()
+        self.supabase.table('jobs').update({
+            'status': status,
+            'result': result,
+            'error': error,
+            'finished_at': now.isoformat(),
+            'expires_at': (now + timedelta(seconds=ttl_seconds)).isoformat(),
+        }).eq('id', job_id).execute()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Expired jobs are filtered by the database, its timestamps are not parsed here
+        # (fromisoformat before Python 3.11 rejects fractional seconds without trailing zeros)
+        result = self.supabase.table('jobs') \
+            .select('*') \
+            .eq('id', job_id) \
+            .or_(f'expires_at.is.null,expires_at.gt."{self._now().isoformat()}"') \
+            .maybe_single() \
+            .execute()
+        if not result or not result.data:
+            return None
+        return result.data
+
+    def recover_stale(self, stale_seconds: int, max_attempts: int, ttl_seconds: int) -> int:
+        now = self._now()
+        stale = self.supabase.table('jobs') \
+            .select('id, attempts') \
+            .eq('status', RUNNING) \
+            .lt('heartbeat_at', (now - timedelta(seconds=stale_seconds)).isoformat()) \
+            .execute().data
+        for job in stale:
+            if job['attempts'] >= max_attempts:
+                values = {
+                    'status': FAILED,
+                    'error': "Worker stopped while running the job",
+                    'finished_at': now.isoformat(),
+                    'expires_at': (now + timedelta(seconds=ttl_seconds)).isoformat(),
+                }
+            else:
+                values = {'status': QUEUED, 'worker_id': None}
+            self.supabase.table('jobs').update(values).eq('id', job['id']).eq('status', RUNNING).execute()
+        return len(stale)
+
+    def purge_expired(self) -> int:
+        return len(self.supabase.table('jobs').delete().lt('expires_at', self._now().isoformat()).execute().data)
+
+
+def create_job_store() -> JobStore:
+    """Job store selected by JOB_STORE"""
+    if JOB_STORE == "supabase":
+        return SupabaseJobStore()
+    return SQLiteJobStore()
@@ -0,0 +1,132 @@
+import json
+import mmap
+import struct
+from collections.abc import Mapping
+from typing import Dict, Iterator, Union
+
+import numpy as np
+from langchain.docstore.base import Docstore
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.schema import Document
+
+# Written next to index.faiss instead of index.pkl, holds every chunk's id, text and metadata
+PACKED_DOCSTORE_FILE = "chunks.bin"
+
+# File layout, all integers little-endian:
+#   magic (8 bytes) | chunk count (uint64)
+#   id offsets, text offsets, metadata offsets (3 arrays of count + 1 uint64, relative to their blob)
+#   id blob (UTF-8) | text blob (UTF-8) | metadata blob (one JSON object per chunk, UTF-8)
+# Chunk i belongs to vector i of index.faiss, so a search hit is decoded without any lookup table.
+MAGIC = b"CHUNKS01"
+HEADER = struct.Struct("<8sQ")
+OFFSET_DTYPE = np.dtype("<u8")
+
+
+def _offsets(values: list) -> np.ndarray:
+    offsets = np.zeros(len(values) + 1, dtype=OFFSET_DTYPE)
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    return offsets
+
+
+def write_packed_docstore(path: str, docstore: Docstore, index_to_docstore_id: Dict[int, str]) -> None:
+    """
+    Write the chunks of a vector store in index order.
+    Args:
+        path: file to write
+        docstore: docstore holding the chunks
+        index_to_docstore_id: position of each chunk's vector in the FAISS index -> chunk id
+    """
+    ids, texts, metadatas = [], [], []
+    for position in range(len(index_to_docstore_id)):
+        chunk_id = index_to_docstore_id[position]
+        chunk = docstore.search(chunk_id)
+        ids.append(str(chunk_id).encode("utf-8"))
+        texts.append(chunk.page_content.encode("utf-8"))
+        metadatas.append(json.dumps(chunk.metadata, ensure_ascii=False).encode("utf-8"))
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(ids)))
+        for blob in (ids, texts, metadatas):
+            f.write(_offsets(blob).tobytes())
+        for blob in (ids, texts, metadatas):
+            for value in blob:
+                f.write(value)
+
+
+class PackedDocstore(Docstore):
+    """
+    Read-only docstore over a memory-mapped chunks.bin.
+    Opening it only reads the header, a chunk is decoded into a Document when a search returns it,
+    so the memory used grows with the chunks that are actually retrieved, not with the chatbot's size.
+    Chunks are looked up by their position in the FAISS index, see PackedPositions.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a packed docstore")
+
+        # The offset arrays are views on the mapped file, nothing is copied
+        offset = HEADER.size
+        arrays = []
+        for _ in range(3):
+            arrays.append(np.frombuffer(self._buffer, dtype=OFFSET_DTYPE, count=self.count + 1, offset=offset))
+            offset += (self.count + 1) * OFFSET_DTYPE.itemsize
+        self._id_offsets, self._text_offsets, self._metadata_offsets = arrays
+        self._id_start = offset
+        self._text_start = self._id_start + int(self._id_offsets[-1])
+        self._metadata_start = self._text_start + int(self._text_offsets[-1])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _read(self, start: int, offsets: np.ndarray, position: int) -> str:
+        return self._buffer[start + int(offsets[position]):start + int(offsets[position + 1])].decode("utf-8")
+
+    def chunk_id(self, position: int) -> str:
+        return self._read(self._id_start, self._id_offsets, position)
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        """Decode the chunk at a position of the FAISS index"""
+        position = int(search)
+        if not 0 <= position < self.count:
+            return f"ID {search} not found."
+        return Document(
+            page_content=self._read(self._text_start, self._text_offsets, position),
+            metadata=json.loads(self._read(self._metadata_start, self._metadata_offsets, position)),
+        )
+
+
+class PackedPositions(Mapping):
+    """
+    index_to_docstore_id for a PackedDocstore, a vector's position is also its key in the docstore.
+    Replaces a dict with an entry per chunk that would have to be built when the index is loaded.
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __getitem__(self, position: int) -> int:
+        if not 0 <= position < self.count:
+            raise KeyError(position)
+        return int(position)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def read_packed_docstore(path: str) -> tuple[InMemoryDocstore, Dict[int, str]]:
+    """Decode every chunk into a writable docstore keyed by chunk id, for ingestion to update"""
+    packed = PackedDocstore(path)
+    documents = {}
+    index_to_docstore_id = {}
+    for position in range(len(packed)):
+        chunk_id = packed.chunk_id(position)
+        documents[chunk_id] = packed.search(position)
+        index_to_docstore_id[position] = chunk_id
+    return InMemoryDocstore(documents), index_to_docstore_id
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+from uuid import UUID
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+# Upper bounds (in seconds) of the latency histogram buckets
+HISTOGRAM_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+
+class LatencyHistogram:
+    """Process-wide histogram of chat pipeline stage durations, exported in the Prometheus text format"""
+    _instance = None
+    _lock = threading.Lock() # use lock to avoid race condition
+
+    def __new__(cls): # singleton pattern
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialize()
+            return cls._instance
+
+    def _initialize(self):
+        """Initialize the singleton instance"""
+        # stage -> {'buckets': counts per bucket (cumulative on export), 'count': ..., 'sum': ...}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.stages_lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.stages_lock:
+            data = self.stages.setdefault(stage, {
+                'buckets': [0] * len(HISTOGRAM_BUCKETS),
+                'count': 0,
+                'sum': 0.0,
+            })
+            for i, upper_bound in enumerate(HISTOGRAM_BUCKETS):
+                if seconds <= upper_bound:
+                    data['buckets'][i] += 1
+                    break
+            data['count'] += 1
+            data['sum'] += seconds
+
+    def render(self) -> str:
+        """Render the histogram in the Prometheus text exposition format"""
+        name = "chat_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Duration of each stage of the chat pipeline.",
+            f"# TYPE {name} histogram",
+        ]
+        with self.stages_lock:
+            for stage, data in sorted(self.stages.items()):
+                cumulative = 0
+                for upper_bound, count in zip(HISTOGRAM_BUCKETS, data['buckets']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{upper_bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {data["count"]}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {data["sum"]}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {data["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Collects the duration of each stage of one chat request"""
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.durations_lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add time to a stage, stages that run several times (e.g. message inserts) are summed"""
+        with self.durations_lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def finish(self, description: str) -> None:
+        """Log the stage timings and record them in the process-wide histogram"""
+        with self.durations_lock:
+            durations = dict(self.durations)
+        histogram = LatencyHistogram()
+        for name, seconds in durations.items():
+            histogram.observe(name, seconds)
+        summary = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in durations.items())
+        logging.info(f"Stage timings for {description}: {summary}")
+
+    def server_timing_header(self) -> str:
+        """Format the timings as a Server-Timing header value"""
+        with self.durations_lock:
+            return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.durations.items())
+
+
+class StageTimingCallbackHandler(BaseCallbackHandler):
+    """
+    Times the stages inside a ConversationalRetrievalChain run.
+    An LLM call that starts before retrieval is the condense-question step, the one after it generates the answer.
+    """
+
+    def __init__(self, timer: StageTimer):
+        self.timer = timer
+        self.started: Dict[UUID, tuple] = {}
+        self.retrieval_done = False
+
+    def _start(self, run_id: UUID, stage: str) -> None:
+        self.started[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> None:
+        stage, start = self.started.pop(run_id, (None, None))
+        if stage:
+            self.timer.add(stage, time.perf_counter() - start)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, "answer_generation" if self.retrieval_done else "condense_question")
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, "answer_generation" if self.retrieval_done else "condense_question")
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_retriever_start(self, serialized: Dict[str, Any], query: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, "retrieval")
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.retrieval_done = True
+        self._end(run_id)
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.retrieval_done = True
+        self._end(run_id)
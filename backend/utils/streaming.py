@@ -0,0 +1,21 @@
+import json
+import queue
+from typing import Any
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Push every token produced by a streaming LLM onto a queue so another thread can consume it"""
+
+    def __init__(self, token_queue: queue.Queue):
+        self.token_queue = token_queue
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token:
+            self.token_queue.put(token)
+
+
+def format_sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
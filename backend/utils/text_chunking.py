@@ -0,0 +1,124 @@
+import logging
+import re
+import threading
+from typing import Any, List, Optional
+
+from config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
+from utils.embedding_scheduler import estimate_tokens
+
+# Values of chatbots.chunking_strategy
+CHARACTER_CHUNKING = "character"  # 1000 character chunks, how documents were always split
+TOKEN_CHUNKING = "token"  # token-sized chunks that keep table rows whole, see StructuredTextSplitter
+CHUNKING_STRATEGIES = [CHARACTER_CHUNKING, TOKEN_CHUNKING]
+
+# Encoding of the OpenAI embedding models
+TOKEN_ENCODING = "cl100k_base"
+
+# Rows of the |a|b|c| tables written by the PDF, CSV, Excel and Word processors
+TABLE_ROW_PATTERN = re.compile(r"^\s*\|.*\|\s*$")
+
+_encoding: Any = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens the embedding model sees for a text"""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+                except Exception as e:
+                    # tiktoken downloads the encoding on first use, without it chunk sizes are estimated
+                    logging.warning(f"Token encoding {TOKEN_ENCODING} unavailable, estimating token counts: {str(e)}")
+                    _encoding = False
+    if _encoding is False:
+        return estimate_tokens(text)
+    return len(_encoding.encode_ordinary(text))
+
+
+class StructuredTextSplitter(TextSplitter):
+    """
+    Splits text into chunks of at most chunk_size tokens, keeping tables readable.
+    Tables are cut between rows only and every table chunk starts with the table's header row, so a
+    chunk retrieved on its own still says what its columns are. Text around tables is split on
+    paragraphs, lines, sentences and words like RecursiveCharacterTextSplitter, measured in tokens.
+    Small neighbouring pieces, like a caption and its table, are packed into one chunk.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_MAX_TOKENS, chunk_overlap: int = CHUNK_OVERLAP_TOKENS, **kwargs: Any):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=count_tokens, **kwargs)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=count_tokens,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+
+    @staticmethod
+    def _blocks(text: str) -> List[tuple[bool, List[str]]]:
+        """Consecutive lines grouped into (is_table, lines) blocks"""
+        blocks: List[tuple[bool, List[str]]] = []
+        for line in text.split("\n"):
+            is_table = TABLE_ROW_PATTERN.match(line) is not None
+            if blocks and blocks[-1][0] == is_table:
+                blocks[-1][1].append(line)
+            else:
+                blocks.append((is_table, [line]))
+        return blocks
+
+    def _split_table(self, rows: List[str]) -> List[str]:
+        """Pack whole rows into chunks, each starting with the header row"""
+        header, rows = rows[0].strip(), [row.strip() for row in rows[1:]]
+        header_tokens = count_tokens(header)
+        chunks = []
+        current: List[str] = []
+        current_tokens = header_tokens
+        for row in rows:
+            row_tokens = count_tokens(row) + 1  # and the line break before it
+            if current and current_tokens + row_tokens > self._chunk_size:
+                chunks.append("\n".join([header] + current))
+                current, current_tokens = [], header_tokens
+            # A row longer than a chunk still stays whole, in a chunk of its own
+            current.append(row)
+            current_tokens += row_tokens
+        chunks.append("\n".join([header] + current))
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        # (block number, chunk, tokens) in document order
+        pieces: List[tuple[int, str, int]] = []
+        for block_num, (is_table, lines) in enumerate(self._blocks(text)):
+            if is_table:
+                chunks = self._split_table(lines)
+            else:
+                chunks = self.text_splitter.split_text("\n".join(lines))
+            pieces += [(block_num, chunk, count_tokens(chunk)) for chunk in chunks if chunk.strip()]
+
+        # Pack pieces of different blocks together while they fit, pieces of one block are already as large as they can be
+        merged: List[str] = []
+        last_block: Optional[int] = None
+        last_tokens = 0
+        for block_num, chunk, tokens in pieces:
+            if merged and block_num != last_block and last_tokens + tokens + 1 <= self._chunk_size:
+                merged[-1] += "\n" + chunk
+                last_tokens += tokens + 1
+            else:
+                merged.append(chunk)
+                last_tokens = tokens
+            last_block = block_num
+        return merged
+
+
+def create_text_splitter(strategy: Optional[str] = None) -> TextSplitter:
+    """Text splitter for a chatbot's chunking strategy, character chunking when it has none"""
+    if strategy == TOKEN_CHUNKING:
+        return StructuredTextSplitter()
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n\n\n"]
+    )
@@ -0,0 +1,78 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import VECTOR_STORE_CACHE_MAX_BYTES
+
+
+class VectorStoreCache:
+    """Process-wide LRU cache of loaded vector stores, keyed by (chatbot_id, index version)"""
+    _instance = None
+    _lock = threading.Lock() # use lock to avoid race condition
+
+    def __new__(cls): # singleton pattern
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialize()
+            return cls._instance
+
+    def _initialize(self):
+        """Initialize the singleton instance"""
+        self.max_bytes = VECTOR_STORE_CACHE_MAX_BYTES
+        self.current_bytes = 0
+        # (chatbot_id, version) -> {'vector_store': ..., 'size_bytes': ...}, least recently used first
+        self.entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self.entries_lock = threading.Lock()
+
+    def get(self, chatbot_id: str, version: str) -> Optional[Any]:
+        """Return the cached vector store for this index version, or None on a miss"""
+        key = (chatbot_id, version)
+        with self.entries_lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            # Mark as most recently used
+            self.entries.move_to_end(key)
+            return entry['vector_store']
+
+    def put(self, chatbot_id: str, version: str, vector_store: Any, size_bytes: int) -> None:
+        """
+        Cache a loaded vector store.
+        Args:
+            chatbot_id: Chatbot the index belongs to
+            version: Version of the published index (older versions of the same chatbot are dropped)
+            vector_store: The loaded vector store
+            size_bytes: Approximate in-memory size, used for the byte limit
+        """
+        if size_bytes > self.max_bytes:
+            logging.info(f"Vector store for chatbot {chatbot_id} ({size_bytes} bytes) exceeds the cache limit, not caching")
+            return
+
+        with self.entries_lock:
+            # Only one version per chatbot is useful, drop any older ones
+            self._remove_chatbot(chatbot_id)
+
+            self.entries[(chatbot_id, version)] = {
+                'vector_store': vector_store,
+                'size_bytes': size_bytes,
+            }
+            self.current_bytes += size_bytes
+
+            # Evict least recently used entries until we are back under the limit
+            while self.current_bytes > self.max_bytes and self.entries:
+                (evicted_chatbot_id, _), evicted = self.entries.popitem(last=False)
+                self.current_bytes -= evicted['size_bytes']
+                logging.info(f"Evicted vector store for chatbot {evicted_chatbot_id} from cache")
+
+    def invalidate(self, chatbot_id: str) -> None:
+        """Drop every cached version of a chatbot's vector store"""
+        with self.entries_lock:
+            self._remove_chatbot(chatbot_id)
+        logging.info(f"Invalidated cached vector store for chatbot {chatbot_id}")
+
+    def _remove_chatbot(self, chatbot_id: str) -> None:
+        """Remove all entries of a chatbot, caller must hold entries_lock"""
+        for key in [key for key in self.entries if key[0] == chatbot_id]:
+            self.current_bytes -= self.entries.pop(key)['size_bytes']